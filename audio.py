@@ -0,0 +1,334 @@
+import hashlib
+import io
+import os
+import queue
+import re
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from typing import List, Optional
+
+from cache import fetch_once
+from metrics import span
+from upstream import get_upstream
+
+class AudioCache:
+    """
+    Content-addressed on-disk store for synthesized speech.
+
+    Files are named after a hash of (text, lang, voice) and the least recently
+    played ones are removed once the store grows past ``max_bytes``.
+    """
+
+    def __init__(self, directory="tts_cache", max_bytes=64 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._total_bytes = sum(
+            entry.stat().st_size for entry in os.scandir(directory) if entry.is_file()
+        )
+
+    @staticmethod
+    def make_key(text: str, lang: str, voice: str) -> str:
+        return hashlib.sha256(f"{lang}\x1f{voice}\x1f{text}".encode('utf-8')).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.mp3")
+
+    def get(self, key: str) -> Optional[bytes]:
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            # Bump mtime so eviction treats this as recently used
+            os.utime(path)
+            return data
+        except FileNotFoundError:
+            return None
+
+    def put(self, key: str, data: bytes):
+        path = self._path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with self._lock:
+            try:
+                old_size = os.path.getsize(path)
+            except OSError:
+                old_size = 0
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+            self._total_bytes += len(data) - old_size
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        entries = sorted(
+            (entry for entry in os.scandir(self.directory) if entry.name.endswith('.mp3')),
+            key=lambda entry: entry.stat().st_mtime
+        )
+        # Trim to 90% of the cap so a single insert doesn't trigger a rescan
+        target = self.max_bytes * 0.9
+        for entry in entries:
+            if self._total_bytes <= target:
+                break
+            try:
+                size = entry.stat().st_size
+                os.remove(entry.path)
+                self._total_bytes -= size
+            except OSError:
+                pass
+
+_audio_cache = None
+_audio_cache_lock = threading.Lock()
+
+def get_audio_cache() -> AudioCache:
+    global _audio_cache
+    if _audio_cache is None:
+        with _audio_cache_lock:
+            if _audio_cache is None:
+                _audio_cache = AudioCache()
+    return _audio_cache
+
+def synthesize(text: str, lang: str = 'en', voice: str = 'com') -> bytes:
+    """Return MP3 bytes for text, from the audio cache when possible. ``voice`` is the gTTS tld"""
+    cache = get_audio_cache()
+    key = cache.make_key(text, lang, voice)
+    with span('tts.cache'):
+        data = cache.get(key)
+    if data is None:
+        # Concurrent requests for the same speech share one gTTS round-trip
+        data = fetch_once(('tts', key), _synthesize_uncached, cache, key, text, lang, voice)
+    return data
+
+def _synthesize_uncached(cache: AudioCache, key: str, text: str, lang: str, voice: str) -> bytes:
+    from gtts import gTTS
+    
+    def request():
+        buffer = io.BytesIO()
+        gTTS(text=text, lang=lang, tld=voice).write_to_fp(buffer)
+        return buffer.getvalue()
+    
+    with span('tts.synthesize'):
+        data = get_upstream('tts').call(request)
+    cache.put(key, data)
+    return data
+
+# Longest chunk sent to gTTS in one request. Short enough that the first
+# chunk of any passage synthesizes quickly, long enough to keep prosody.
+MAX_CHUNK_CHARS = 150
+
+_SENTENCE_BREAK_RE = re.compile(r'(?<=[.!?;])\s+|(?<=[。！？；])\s*')
+_CLAUSE_BREAK_RE = re.compile(r'(?<=[,:])\s+|(?<=[，：、])\s*')
+
+def split_for_speech(text: str, max_chars: int = MAX_CHUNK_CHARS) -> List[str]:
+    """
+    Split text into chunks of at most max_chars, breaking at sentence ends
+    where possible, then at clause breaks, then between words. Short pieces
+    are packed together so a paragraph doesn't turn into dozens of requests.
+    """
+    pieces = []
+    for sentence in _SENTENCE_BREAK_RE.split(text.strip()):
+        if len(sentence) <= max_chars:
+            pieces.append(sentence)
+            continue
+        for clause in _CLAUSE_BREAK_RE.split(sentence):
+            if len(clause) <= max_chars:
+                pieces.append(clause)
+                continue
+            words = clause.split()
+            if len(words) == 1:
+                # One unbroken run (CJK without punctuation, a long URL...)
+                pieces.extend(clause[i:i + max_chars] for i in range(0, len(clause), max_chars))
+            else:
+                pieces.extend(words)
+
+    chunks = []
+    for piece in pieces:
+        piece = piece.strip()
+        if not piece:
+            continue
+        if chunks and len(chunks[-1]) + 1 + len(piece) <= max_chars:
+            chunks[-1] = f"{chunks[-1]} {piece}"
+        else:
+            chunks.append(piece)
+    return chunks
+
+# Synthesizes upcoming chunks while earlier ones play
+_tts_executor = ThreadPoolExecutor(max_workers=3, thread_name_prefix='tts')
+
+class AudioPlayer:
+    """
+    Long-lived playback service.
+
+    The mixer is initialized once and a single worker thread consumes a
+    command queue. A new sound interrupts whatever is playing instead of
+    overlapping it, and ``state``/``current_text`` can be read by the UI.
+
+    Text is spoken as a stream of chunks (see split_for_speech): up to
+    ``LOOKAHEAD`` chunks are synthesized in parallel ahead of the one
+    playing, and each plays as soon as the previous one ends. The wait for
+    the first audio depends on the first chunk only, and at most a few
+    chunks are held in memory however long the text is.
+    """
+
+    IDLE = 'idle'
+    LOADING = 'loading'
+    PLAYING = 'playing'
+
+    LOOKAHEAD = 3
+
+    def __init__(self):
+        self.commands = queue.Queue()
+        self.state = self.IDLE
+        self.current_text = None
+        self._buffer = None
+        self._chunks = deque()    # chunk texts not yet submitted for synthesis
+        self._pending = deque()   # synthesis futures, in playback order
+        self._lang = 'en'
+        self._text = None
+        self._thread = threading.Thread(target=self._run, name='audio-player', daemon=True)
+        self._thread.start()
+
+    def speak(self, text: str, lang: str = 'en'):
+        self.commands.put(('speak', text, lang))
+
+    def stop(self):
+        self.commands.put(('stop',))
+
+    def shutdown(self):
+        self.commands.put(('quit',))
+
+    def _set_state(self, state, text=None):
+        self.current_text = text
+        self.state = state
+
+    def _next_command(self):
+        # While something is playing, wake up now and then to notice it ended;
+        # more often when the next chunk has to follow without a gap
+        if self.state != self.PLAYING:
+            timeout = None
+        elif self._pending:
+            timeout = 0.01
+        else:
+            timeout = 0.05
+        try:
+            command = self.commands.get(timeout=timeout)
+        except queue.Empty:
+            return None
+        # Only the newest pending request matters; older ones are already stale
+        while command[0] != 'quit':
+            try:
+                command = self.commands.get_nowait()
+            except queue.Empty:
+                break
+        return command
+
+    def _init_mixer(self):
+        """pygame with its mixer ready, or None while there's no usable audio device"""
+        try:
+            # Imported here so loading the module doesn't pull in SDL
+            import pygame
+
+            pygame.mixer.init()
+            return pygame
+        except Exception as e:
+            print(f"Audio device error: {e}")
+            return None
+
+    def _run(self):
+        pygame = self._init_mixer()
+        while True:
+            command = self._next_command()
+            if command is None:
+                if not pygame.mixer.music.get_busy():
+                    self._play_next(pygame)
+                continue
+
+            if pygame is not None:
+                pygame.mixer.music.stop()
+            self._clear_stream()
+            if command[0] == 'quit':
+                if pygame is not None:
+                    pygame.mixer.quit()
+                self._set_state(self.IDLE)
+                return
+            if command[0] == 'stop':
+                self._set_state(self.IDLE)
+                continue
+
+            if pygame is None:
+                # Retried on every request, so a device plugged in later works;
+                # until then requests are dropped rather than queued up
+                pygame = self._init_mixer()
+                if pygame is None:
+                    self._set_state(self.IDLE)
+                    continue
+
+            _, text, lang = command
+            self._text = text
+            self._lang = lang
+            self._chunks.extend(split_for_speech(text))
+            self._fill_lookahead()
+            self._set_state(self.LOADING, text)
+            self._play_next(pygame)
+
+    def _fill_lookahead(self):
+        while self._chunks and len(self._pending) < self.LOOKAHEAD:
+            self._pending.append(_tts_executor.submit(synthesize, self._chunks.popleft(), self._lang))
+
+    def _clear_stream(self):
+        for future in self._pending:
+            future.cancel()
+        self._pending.clear()
+        self._chunks.clear()
+
+    def _play_next(self, pygame):
+        """Start the next chunk once it's synthesized, unless a new command preempts it"""
+        while self._pending:
+            future = self._pending[0]
+            try:
+                data = future.result(timeout=0.05)
+            except TimeoutError:
+                if not self.commands.empty():
+                    # Preempted while synthesizing
+                    return
+                if self.state != self.LOADING:
+                    self._set_state(self.LOADING, self._text)
+                continue
+            except Exception as e:
+                print(f"Speech synthesis error: {e}")
+                self._pending.popleft()
+                self._fill_lookahead()
+                continue
+            self._pending.popleft()
+            self._fill_lookahead()
+            if not self.commands.empty():
+                return
+            try:
+                # Keep a reference: pygame streams from the buffer while playing
+                with span('audio.start'):
+                    self._buffer = io.BytesIO(data)
+                    pygame.mixer.music.load(self._buffer, 'mp3')
+                    pygame.mixer.music.play()
+                self._set_state(self.PLAYING, self._text)
+                return
+            except Exception as e:
+                print(f"Audio playback error: {e}")
+        self._set_state(self.IDLE)
+
+_player = None
+_player_lock = threading.Lock()
+
+def get_player() -> AudioPlayer:
+    """Process-wide playback service, started on first use"""
+    global _player
+    if _player is None:
+        with _player_lock:
+            if _player is None:
+                _player = AudioPlayer()
+    return _player
+
+def current_player() -> Optional[AudioPlayer]:
+    """The playback service if something already started it, without starting it"""
+    return _player
@@ -0,0 +1,175 @@
+import argparse
+import contextlib
+import json
+import os
+import sys
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Iterator, Optional
+
+from daemon import connect, url_argument
+from http_client import ensure_pool_size
+from translator import get_word_info
+from upstream import RateLimiter, set_rate
+
+# Words per request when a daemon does the lookups
+REMOTE_BATCH_SIZE = 50
+
+def translate_word(word: str, rate_limiter: Optional[RateLimiter] = None) -> Dict:
+    """Look up one word for batch output; failures are reported in an 'error' field"""
+    if rate_limiter is not None:
+        rate_limiter.acquire()
+    try:
+        # The batch pool already runs words side by side, so stages run inline
+        return get_word_info(word, concurrent=False)
+    except Exception as e:
+        return {'input': word, 'error': str(e)}
+
+def iter_batch(words: Iterable[str], concurrency: int = 4, rate_limit: Optional[float] = None) -> Iterator[Dict]:
+    """
+    Look up words with at most ``concurrency`` lookups in flight and yield the
+    results in input order. At most a few results per worker are buffered, so
+    memory stays flat on arbitrarily long inputs.
+    """
+    ensure_pool_size(concurrency)
+    rate_limiter = RateLimiter(rate_limit) if rate_limit else None
+    window = deque()
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='batch') as executor:
+        for word in words:
+            window.append(executor.submit(translate_word, word, rate_limiter))
+            if len(window) >= concurrency * 2:
+                yield window.popleft().result()
+        while window:
+            yield window.popleft().result()
+
+def iter_remote_batch(words: Iterable[str], client, concurrency: int = 4,
+                      rate_limit: Optional[float] = None) -> Iterator[Dict]:
+    """
+    Like iter_batch, but the lookups run in a daemon (see daemon.DaemonClient),
+    REMOTE_BATCH_SIZE words per request with the next request already on its way
+    """
+    rate_limiter = RateLimiter(rate_limit) if rate_limit else None
+
+    def send(chunk):
+        if rate_limiter is not None:
+            for _ in chunk:
+                rate_limiter.acquire()
+        return client.batch(chunk, concurrency)
+
+    window = deque()
+    chunk = []
+    with ThreadPoolExecutor(max_workers=2, thread_name_prefix='batch') as executor:
+        for word in words:
+            chunk.append(word)
+            if len(chunk) >= REMOTE_BATCH_SIZE:
+                window.append(executor.submit(send, chunk))
+                chunk = []
+                if len(window) >= 2:
+                    yield from window.popleft().result()
+        if chunk:
+            window.append(executor.submit(send, chunk))
+        while window:
+            yield from window.popleft().result()
+
+def read_words(stream) -> Iterator[str]:
+    for line in stream:
+        word = line.strip()
+        if word:
+            yield word
+
+def count_completed(output_path: str) -> int:
+    """
+    Number of complete result lines already in output_path. A torn last line
+    from an interrupted run is cut off so appending can continue cleanly.
+    """
+    if not os.path.exists(output_path):
+        return 0
+    completed = 0
+    valid_bytes = 0
+    with open(output_path, 'rb') as f:
+        for raw_line in f:
+            try:
+                if not raw_line.endswith(b'\n'):
+                    raise ValueError("incomplete line")
+                json.loads(raw_line)
+            except ValueError:
+                break
+            completed += 1
+            valid_bytes += len(raw_line)
+    if valid_bytes != os.path.getsize(output_path):
+        with open(output_path, 'r+b') as f:
+            f.truncate(valid_bytes)
+    return completed
+
+def run_batch(input_path: str = '-', output_path: Optional[str] = None, concurrency: int = 4,
+              rate_limit: Optional[float] = None, resume: bool = False, client=None) -> int:
+    """
+    Translate a word list (one word per line, '-' for stdin) to JSONL.
+    With resume, words already present in output_path are skipped. With a
+    daemon client, the daemon does the lookups.
+    Returns the number of words looked up in this run.
+    """
+    skip = count_completed(output_path) if resume and output_path else 0
+    input_file = sys.stdin if input_path == '-' else open(input_path, 'r', encoding='utf-8')
+    if output_path:
+        output_file = open(output_path, 'a' if resume else 'w', encoding='utf-8')
+    else:
+        output_file = sys.stdout
+
+    processed = 0
+    try:
+        words = read_words(input_file)
+        for _ in range(skip):
+            if next(words, None) is None:
+                break
+        # The lookup code reports failures with print(); send that to stderr
+        # so stdout stays pure JSONL (output_file holds the real stdout)
+        with contextlib.redirect_stdout(sys.stderr):
+            if client is not None:
+                results = iter_remote_batch(words, client, concurrency, rate_limit)
+            else:
+                results = iter_batch(words, concurrency, rate_limit)
+            for result in results:
+                output_file.write(json.dumps(result, ensure_ascii=False) + '\n')
+                output_file.flush()
+                processed += 1
+    finally:
+        if input_file is not sys.stdin:
+            input_file.close()
+        if output_file is not sys.stdout:
+            output_file.close()
+    return processed
+
+def add_arguments(parser):
+    parser.add_argument('input', nargs='?', default='-', help="word list, one per line ('-' for stdin)")
+    parser.add_argument('-o', '--output', help="JSONL output file (default: stdout)")
+    parser.add_argument('-c', '--concurrency', type=int, default=4, help="lookups in flight at once")
+    parser.add_argument('-r', '--rate-limit', type=float, help="max lookups started per second")
+    parser.add_argument('--resume', action='store_true', help="skip words already in the output file")
+    parser.add_argument('--upstream-rate', type=float,
+                        help="requests per second allowed to Google and Cambridge each (default: 5). "
+                             "This caps throughput whatever --concurrency is; with --daemon, "
+                             "the daemon's own setting applies")
+    # Also accepted before the subcommand; SUPPRESS keeps that value when it isn't repeated here
+    parser.add_argument('--daemon', metavar='URL', type=url_argument, default=argparse.SUPPRESS,
+                        help="look words up through the daemon at URL (falls back to local lookups)")
+
+def main(args) -> int:
+    if args.resume and not args.output:
+        print("--resume needs --output", file=sys.stderr)
+        return 2
+    if args.concurrency < 1:
+        print("--concurrency must be at least 1", file=sys.stderr)
+        return 2
+    for option, value in (('--rate-limit', args.rate_limit), ('--upstream-rate', args.upstream_rate)):
+        if value is not None and value <= 0:
+            print(f"{option} must be greater than 0", file=sys.stderr)
+            return 2
+    if args.upstream_rate:
+        set_rate(args.upstream_rate, names=('google', 'cambridge'))
+    client = None
+    if getattr(args, 'daemon', None):
+        client = connect(args.daemon)
+    processed = run_batch(args.input, args.output, args.concurrency, args.rate_limit, args.resume, client)
+    print(f"Translated {processed} words", file=sys.stderr)
+    return 0
@@ -0,0 +1,409 @@
+"""
+End-to-end latency benchmark against local stand-ins for Google Translate,
+Cambridge Dictionary and Google TTS.
+
+One local HTTP server plays all three services with configurable latency,
+jitter and error rate, so runs need no network and are comparable between
+machines and commits:
+
+    python -m benchmarks.e2e_benchmark [--latency MS] [--jitter MS] [--error-rate P]
+                                       [--lookups N] [--concurrency N] [--output FILE]
+                                       [--compare BASELINE.json] [--tolerance 0.25]
+
+The Cambridge scraper is pointed at the local server and serves the
+synthetic entry pages in benchmarks/fixtures/cambridge (see
+benchmarks/parser_benchmark.py). googletrans speaks a private protocol, so it is
+replaced at the client layer (http_client's shared translator) by a small
+client that calls the local server. gTTS is replaced the same way. Everything
+else (detection, caching, the lookup pipeline, history search, the audio
+cache) is the real code.
+
+Each workload runs in a fresh temporary directory, so the on-disk caches
+start empty. The report is JSON: for every workload the wall time and, per
+stage, count, errors, p50/p95/p99/mean latency in ms and throughput. With
+--compare the run fails (exit 1) when a stage's p95 regressed by more than
+--tolerance against a saved report.
+"""
+import argparse
+import contextlib
+import glob
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import types
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+from urllib.parse import parse_qs, unquote, urlparse
+
+import requests
+
+import audio
+import cache
+import dictionary
+import http_client
+import offline_dictionary
+import upstream
+from history_index import HistoryIndex
+from storage import HistoryRecord
+from translator import iter_word_info
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), 'fixtures', 'cambridge')
+DEFAULT_PAGE = 'hello'
+
+class FakeServiceHandler(BaseHTTPRequestHandler):
+    """Serves /translate, /dictionary/english/<word> and /tts with simulated latency and errors"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        server = self.server
+        server.simulate_latency()
+        if server.should_fail():
+            self.reply(500, b'simulated failure', 'text/plain')
+            return
+
+        url = urlparse(self.path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        if url.path == '/translate':
+            text = f"[{query.get('dest', '')}] {query.get('text', '')}"
+            self.reply(200, text.encode('utf-8'), 'text/plain; charset=utf-8')
+        elif url.path.startswith('/dictionary/english/'):
+            word = unquote(url.path[len('/dictionary/english/'):])
+            page = server.pages.get(word, server.pages[DEFAULT_PAGE])
+            self.reply(200, page, 'text/html; charset=utf-8')
+        elif url.path == '/tts':
+            # Roughly the size of a real MP3 for the text
+            body = b'ID3' + b'\0' * (200 * len(query.get('text', '')))
+            self.reply(200, body, 'audio/mpeg')
+        else:
+            self.reply(404, b'not found', 'text/plain')
+
+    def reply(self, status: int, body: bytes, content_type: str):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+class FakeServices(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, latency_ms: float, jitter_ms: float, error_rate: float, seed: int, fixtures: str):
+        super().__init__(('127.0.0.1', 0), FakeServiceHandler)
+        self.latency = latency_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+        self._random_lock = threading.Lock()
+        self.pages = {}
+        for path in glob.glob(os.path.join(fixtures, '*.html')):
+            with open(path, 'rb') as f:
+                self.pages[os.path.splitext(os.path.basename(path))[0]] = f.read()
+        self._thread = threading.Thread(target=self.serve_forever, name='fake-services', daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def simulate_latency(self):
+        with self._random_lock:
+            delay = self._random.gauss(self.latency, self.jitter) if self.jitter else self.latency
+        if delay > 0:
+            time.sleep(delay)
+
+    def should_fail(self) -> bool:
+        with self._random_lock:
+            return self._random.random() < self.error_rate
+
+class LocalTranslator:
+    """Stand-in for googletrans.Translator that asks the fake server instead"""
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url
+        self.client = requests.Session()
+
+    def translate(self, text, dest='en', src='auto'):
+        response = self.client.get(
+            f"{self.base_url}/translate",
+            params={'text': text, 'dest': dest, 'src': src},
+            timeout=http_client.get_timeout(),
+        )
+        response.raise_for_status()
+        return types.SimpleNamespace(text=response.text, src=src, dest=dest)
+
+def make_tts_module(base_url: str) -> types.ModuleType:
+    """A 'gtts' module whose gTTS fetches speech from the fake server"""
+    session = requests.Session()
+
+    class gTTS:
+        def __init__(self, text, lang='en', tld='com', **kwargs):
+            self.text = text
+            self.lang = lang
+
+        def write_to_fp(self, fp):
+            response = session.get(f"{base_url}/tts", params={'text': self.text, 'lang': self.lang},
+                                   timeout=http_client.get_timeout())
+            response.raise_for_status()
+            fp.write(response.content)
+
+    module = types.ModuleType('gtts')
+    module.gTTS = gTTS
+    return module
+
+def install_stand_ins(base_url: str):
+    http_client.close()
+    http_client._translator = LocalTranslator(base_url)
+    dictionary._dictionary.base_url = f"{base_url}/dictionary/english/"
+    sys.modules['gtts'] = make_tts_module(base_url)
+
+def reset_caches():
+    """Drop the process-wide caches so the next workload opens fresh ones in the cwd"""
+    if cache._cache is not None:
+        cache._cache.close()
+        cache._cache = None
+    audio._audio_cache = None
+    offline_dictionary._offline = None
+
+def reset_upstream_state():
+    """Forget what earlier workloads taught the call policy: open breakers, lowered rates, recent failures"""
+    cache._failures = cache.FailureCache()
+    cache._single_flight = cache.SingleFlight()
+    upstream._upstreams.clear()
+
+class Recorder:
+    """Latency samples per stage for one workload"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+        self.started = time.perf_counter()
+        self.wall = None
+
+    def record(self, stage: str, seconds: float):
+        with self._lock:
+            self.samples.setdefault(stage, []).append(seconds)
+
+    def error(self, stage: str):
+        with self._lock:
+            self.errors[stage] = self.errors.get(stage, 0) + 1
+
+    def finish(self):
+        self.wall = time.perf_counter() - self.started
+
+    def report(self) -> Dict:
+        stages = {}
+        for stage in sorted(set(self.samples) | set(self.errors)):
+            samples = sorted(self.samples.get(stage, []))
+            stats = {
+                'count': len(samples),
+                'errors': self.errors.get(stage, 0),
+                'throughput_per_s': round(len(samples) / self.wall, 2) if self.wall else None,
+            }
+            if samples:
+                stats.update({
+                    'p50_ms': round(percentile(samples, 50) * 1000, 3),
+                    'p95_ms': round(percentile(samples, 95) * 1000, 3),
+                    'p99_ms': round(percentile(samples, 99) * 1000, 3),
+                    'mean_ms': round(sum(samples) / len(samples) * 1000, 3),
+                })
+            stages[stage] = stats
+        return {'wall_s': round(self.wall, 3), 'stages': stages}
+
+def percentile(sorted_samples: List[float], pct: float) -> float:
+    """Nearest-rank percentile of already sorted samples"""
+    rank = max(1, -(-len(sorted_samples) * pct // 100))
+    return sorted_samples[int(rank) - 1]
+
+def timed_lookup(text: str, recorder: Recorder):
+    """Run one lookup, recording the time from start to each stage"""
+    started = time.perf_counter()
+    try:
+        for stage, word_info in iter_word_info(text):
+            recorder.record(f"lookup.{stage}", time.perf_counter() - started)
+        recorder.record('lookup.total', time.perf_counter() - started)
+        if not word_info.get('dictionary'):
+            recorder.error('lookup.dictionary')
+    except Exception:
+        recorder.error('lookup.total')
+
+def run_lookups(words: List[str], concurrency: int) -> Dict:
+    recorder = Recorder()
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='bench') as executor:
+        for future in [executor.submit(timed_lookup, word, recorder) for word in words]:
+            future.result()
+    recorder.finish()
+    return recorder.report()
+
+def make_vocabulary(size: int, pages) -> List[str]:
+    """Fixture words first, then synthetic English and Chinese inputs (about 1 in 5 Chinese)"""
+    words = sorted(pages)
+    i = 0
+    while len(words) < size:
+        words.append(f"中文詞{i}" if i % 5 == 4 else f"word{i}")
+        i += 1
+    return words[:size]
+
+def history_workload(size: int, rng: random.Random) -> Dict:
+    recorder = Recorder()
+    records = [HistoryRecord(str(i), f"word{i}", f"翻譯{i} example {i % 97}") for i in range(size)]
+    started = time.perf_counter()
+    index = HistoryIndex(records)
+    recorder.record('history.build', time.perf_counter() - started)
+
+    queries = {
+        'history.search.short': lambda: rng.choice(['w', 'wo', '1', '翻', 'ex']),
+        'history.search.trigram': lambda: f"word{rng.randrange(size)}",
+        'history.search.miss': lambda: f"zz{rng.randrange(1000)}q",
+    }
+    for stage, make_query in queries.items():
+        for _ in range(200):
+            query = make_query()
+            started = time.perf_counter()
+            index.search(query)
+            recorder.record(stage, time.perf_counter() - started)
+    for _ in range(200):
+        query = f"word{rng.randrange(size)}"
+        started = time.perf_counter()
+        index.find_exact(query)
+        recorder.record('history.find_exact', time.perf_counter() - started)
+    recorder.finish()
+    return recorder.report()
+
+def audio_workload(count: int, concurrency: int) -> Dict:
+    """Synthesize unique texts (cache misses), then the same texts again (cache hits)"""
+    recorder = Recorder()
+
+    def timed_synthesize(text, stage):
+        started = time.perf_counter()
+        try:
+            audio.synthesize(text, lang='en')
+            recorder.record(stage, time.perf_counter() - started)
+        except Exception:
+            recorder.error(stage)
+
+    texts = [f"benchmark sentence number {i}" for i in range(count)]
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='bench') as executor:
+        for stage in ('audio.synthesize.cold', 'audio.synthesize.warm'):
+            list(executor.map(lambda text: timed_synthesize(text, stage), texts))
+    recorder.finish()
+    return recorder.report()
+
+def run_workloads(args, services: FakeServices) -> Dict:
+    rng = random.Random(args.seed)
+    vocabulary = make_vocabulary(args.lookups, services.pages)
+    # Zipf-like: a few words come up over and over, most only once or twice
+    weights = [1 / rank for rank in range(1, len(vocabulary) + 1)]
+    workloads = {
+        'lookup_cold': lambda: run_lookups(vocabulary, args.concurrency),
+        'lookup_warm': lambda: run_lookups(vocabulary, args.concurrency),
+        'lookup_zipf': lambda: run_lookups(rng.choices(vocabulary, weights, k=args.lookups), args.concurrency),
+        'history_search': lambda: history_workload(args.history_size, rng),
+        'audio': lambda: audio_workload(max(1, args.lookups // 4), args.concurrency),
+    }
+
+    results = {}
+    original_cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix='omni-bench-') as workdir:
+        for name, workload in workloads.items():
+            # lookup_warm reuses the caches lookup_cold just filled
+            if name != 'lookup_warm':
+                reset_caches()
+                directory = tempfile.mkdtemp(dir=workdir)
+            reset_upstream_state()
+            os.chdir(directory)
+            try:
+                print(f"Running {name}...", file=sys.stderr)
+                results[name] = workload()
+            finally:
+                os.chdir(original_cwd)
+        reset_caches()
+    return results
+
+def compare(report: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """p95 regressions beyond tolerance, as readable lines"""
+    regressions = []
+    for workload, result in report['workloads'].items():
+        base_stages = baseline.get('workloads', {}).get(workload, {}).get('stages', {})
+        for stage, stats in result['stages'].items():
+            base = base_stages.get(stage, {}).get('p95_ms')
+            current = stats.get('p95_ms')
+            if base and current and current > base * (1 + tolerance):
+                regressions.append(f"{workload}/{stage}: p95 {base:.3f} ms -> {current:.3f} ms")
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--latency', type=float, default=50, help="mean simulated service latency (ms)")
+    parser.add_argument('--jitter', type=float, default=10, help="standard deviation of the latency (ms)")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="fraction of requests answered with HTTP 500")
+    parser.add_argument('--lookups', type=int, default=200, help="lookups per lookup workload")
+    parser.add_argument('--concurrency', type=int, default=4, help="lookups in flight at once")
+    parser.add_argument('--history-size', type=int, default=50000, help="entries in the history search workload")
+    parser.add_argument('--upstream-rate', type=float, default=1000,
+                        help="per-host request rate allowed by the upstream policy (req/s)")
+    parser.add_argument('--fixtures', default=FIXTURES_DIR)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="write the JSON report here instead of stdout")
+    parser.add_argument('--compare', metavar='BASELINE', help="fail if p95 regressed against this report")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="allowed p95 increase for --compare")
+    args = parser.parse_args(argv)
+
+    services = FakeServices(args.latency, args.jitter, args.error_rate, args.seed, args.fixtures)
+    services.start()
+    # The app reports failures with print(); keep stdout for the JSON report
+    with contextlib.redirect_stdout(sys.stderr):
+        try:
+            # Pools are sized first: resizing rebuilds the shared clients
+            http_client.ensure_pool_size(args.concurrency * 2)
+            install_stand_ins(services.base_url)
+            for name in ('google', 'cambridge', 'tts'):
+                upstream.configure(name, rate=args.upstream_rate, burst=max(1, int(args.upstream_rate)))
+            report = {
+                'config': {
+                    'latency_ms': args.latency,
+                    'jitter_ms': args.jitter,
+                    'error_rate': args.error_rate,
+                    'lookups': args.lookups,
+                    'concurrency': args.concurrency,
+                    'history_size': args.history_size,
+                    'upstream_rate': args.upstream_rate,
+                    'seed': args.seed,
+                },
+                'workloads': run_workloads(args, services),
+            }
+        finally:
+            services.stop()
+
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
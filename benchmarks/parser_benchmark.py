@@ -0,0 +1,224 @@
+"""
+Compare the single-pass Cambridge page parser against the old regex parser.
+
+Runs both over every page in benchmarks/fixtures/cambridge, compares what
+they extract, and reports parse time per page:
+
+    python -m benchmarks.parser_benchmark [--repeat N] [--fixtures DIR] [--expected FILE]
+
+The reference is the old parser as it shipped (``legacy_parse``). The
+rewrite changes some output on purpose, and every such difference is listed,
+per page and field, in expected_differences.json next to the pages, with the
+reason. The run fails on any difference not listed there, and on listed ones
+that no longer occur. The intended changes:
+
+- Definitions and examples come from every sense of the entry, up to three.
+  The old pos-body pre-pass matched ``</div></div></div>`` non-greedily, so
+  it stopped at the first sense block and mostly returned a single
+  definition.
+- IPA with nested spans (``ˈæp.<span class="sp dsp">ə</span>l``, as on
+  most real entries) is read whole. The old patterns needed plain text up
+  to ``</span>``, so they returned no pronunciation or one from a later
+  block.
+
+The bundled pages are synthetic: they follow the class names and nesting of
+Cambridge entry pages, padded with filler navigation, but were written by
+hand rather than captured. Agreement on them is no proof of agreement on real
+pages. Point --fixtures at a directory of saved entry pages (named
+<word>.html, with their own expected_differences.json) for that. Markup the
+synthetic pages don't have, such as extra attributes on the def/eg/pos
+elements or other inline tags, can make either parser miss an element.
+"""
+import argparse
+import glob
+import html as html_lib
+import json
+import os
+import re
+import sys
+import time
+from typing import Dict, Optional
+
+from dictionary import CambridgeDictionary
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), 'fixtures', 'cambridge')
+
+def legacy_parse(html: str, word: str) -> Optional[Dict]:
+    """The regex parser CambridgeDictionary used before the single-pass rewrite, minus its debug prints"""
+    try:
+        result = {
+            'word': word,
+            'definitions': [],
+            'examples': [],
+            'pronunciation': '',
+            'part_of_speech': ''
+        }
+
+        # Extract pronunciation (phonetic) - multiple patterns
+        pronunciation_patterns = [
+            r'<span class="ipa dipa lpr-2 lpl-1">([^<]+)</span>',
+            r'<span class="ipa dipa[^>]*">([^<]+)</span>',
+            r'<span class="pron dpron[^>]*">.*?<span class="ipa[^>]*">([^<]+)</span>'
+        ]
+
+        for pattern in pronunciation_patterns:
+            pronunciation_match = re.search(pattern, html)
+            if pronunciation_match:
+                result['pronunciation'] = pronunciation_match.group(1).strip()
+                break
+
+        # Extract part of speech - multiple patterns
+        pos_patterns = [
+            r'<span class="pos dpos">([^<]+)</span>',
+            r'<span class="pos[^>]*">([^<]+)</span>'
+        ]
+
+        for pattern in pos_patterns:
+            pos_match = re.search(pattern, html)
+            if pos_match:
+                result['part_of_speech'] = pos_match.group(1).strip()
+                break
+
+        # Find pos-body sections which contain the main content
+        pos_body_pattern = r'<div class="pos-body">(.*?)</div>\s*</div>\s*</div>'
+        pos_body_matches = re.findall(pos_body_pattern, html, re.DOTALL)
+
+        definitions = []
+        examples = []
+
+        for pos_body in pos_body_matches:
+            # Extract definitions from def ddef_d db divs
+            def_patterns = [
+                r'<div class="def ddef_d db">([^<]*(?:<[^/>]+>[^<]*</[^>]+>[^<]*)*)</div>',
+                r'<div class="def ddef_d db">(.*?)</div>'
+            ]
+
+            for def_pattern in def_patterns:
+                def_matches = re.findall(def_pattern, pos_body, re.DOTALL)
+                for def_match in def_matches:
+                    # Clean up HTML tags and get text content
+                    clean_def = re.sub(r'<[^>]+>', '', def_match).strip()
+                    if clean_def and len(clean_def) > 3:  # Avoid empty or very short definitions
+                        definitions.append(clean_def)
+
+            # Extract examples from eg deg spans
+            example_patterns = [
+                r'<span class="eg deg">([^<]*(?:<[^/>]+>[^<]*</[^>]+>[^<]*)*)</span>',
+                r'<span class="eg deg">(.*?)</span>'
+            ]
+
+            for ex_pattern in example_patterns:
+                ex_matches = re.findall(ex_pattern, pos_body, re.DOTALL)
+                for ex_match in ex_matches:
+                    # Clean up HTML tags and get text content
+                    clean_ex = re.sub(r'<[^>]+>', '', ex_match).strip()
+                    if clean_ex and len(clean_ex) > 3:  # Avoid empty or very short examples
+                        examples.append(clean_ex)
+
+        # Fallback: try broader patterns if pos-body didn't work
+        if not definitions:
+            def_pattern = r'<div class="def ddef_d db">(.*?)</div>'
+            definitions = re.findall(def_pattern, html, re.DOTALL)
+            definitions = [re.sub(r'<[^>]+>', '', def_text).strip() for def_text in definitions]
+            definitions = [d for d in definitions if d and len(d) > 3]
+
+        if not examples:
+            example_pattern = r'<span class="eg deg">(.*?)</span>'
+            examples = re.findall(example_pattern, html, re.DOTALL)
+            examples = [re.sub(r'<[^>]+>', '', ex).strip() for ex in examples]
+            examples = [e for e in examples if e and len(e) > 3]
+
+        # Limit results and remove duplicates
+        result['definitions'] = list(dict.fromkeys(definitions))[:3]
+        result['examples'] = list(dict.fromkeys(examples))[:3]
+
+        # Only return result if we found at least one definition
+        if result['definitions']:
+            return result
+        return None
+
+    except Exception as e:
+        print(f"Dictionary parsing error: {e}")
+        return None
+
+
+def normalize(result: Optional[Dict]) -> Optional[Dict]:
+    """The old parser left HTML entities undecoded; decode them before comparing"""
+    if result is None:
+        return None
+    return {
+        key: [html_lib.unescape(item) for item in value] if isinstance(value, list)
+        else html_lib.unescape(value)
+        for key, value in result.items()
+    }
+
+def differences(old: Optional[Dict], new: Optional[Dict]) -> Dict:
+    """field -> {'old': ..., 'new': ...} for every field the two results disagree on"""
+    if old is None or new is None:
+        return {} if old == new else {'result': {'old': old, 'new': new}}
+    return {
+        field: {'old': old.get(field), 'new': new.get(field)}
+        for field in sorted(set(old) | set(new))
+        if old.get(field) != new.get(field)
+    }
+
+def load_expected(path: str) -> Dict:
+    """page -> field -> {'old', 'new', 'reason'}; no file means no differences are expected"""
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+def time_parser(parse, html: str, word: str, repeat: int) -> float:
+    """Best-of-three mean time per parse, in milliseconds"""
+    best = float('inf')
+    for _ in range(3):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            parse(html, word)
+        best = min(best, (time.perf_counter() - start) / repeat)
+    return best * 1000
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--fixtures', default=FIXTURES_DIR)
+    parser.add_argument('--expected', help="intended differences (default: expected_differences.json in --fixtures)")
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args(argv)
+
+    dictionary = CambridgeDictionary()
+    paths = sorted(glob.glob(os.path.join(args.fixtures, '*.html')))
+    if not paths:
+        print(f"No fixtures found in {args.fixtures}")
+        return 1
+    expected = load_expected(args.expected or os.path.join(args.fixtures, 'expected_differences.json'))
+
+    failures = 0
+    print(f"{'page':<16}{'size':>10}{'old ms':>10}{'new ms':>10}{'speedup':>10}")
+    for path in paths:
+        word = os.path.splitext(os.path.basename(path))[0]
+        with open(path, encoding='utf-8') as f:
+            html = f.read()
+
+        found = differences(normalize(legacy_parse(html, word)), dictionary._parse_dictionary_page(html, word))
+        intended = expected.get(word, {})
+        for field in sorted(set(found) | set(intended)):
+            want = intended.get(field)
+            if want is not None and found.get(field) == {'old': want['old'], 'new': want['new']}:
+                print(f"changed {word}.{field}: {want['reason']}")
+            elif field in found:
+                failures += 1
+                print(f"UNEXPECTED {word}.{field}:\n  old: {found[field]['old']}\n  new: {found[field]['new']}")
+            else:
+                failures += 1
+                print(f"MISSING {word}.{field}: expected difference no longer occurs")
+
+        old_ms = time_parser(legacy_parse, html, word, args.repeat)
+        new_ms = time_parser(dictionary._parse_dictionary_page, html, word, args.repeat)
+        print(f"{word:<16}{len(html):>10}{old_ms:>10.3f}{new_ms:>10.3f}{old_ms / new_ms:>9.1f}x")
+
+    print(f"{len(paths)} pages, {failures} unexpected differences")
+    return 1 if failures else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
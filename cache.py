@@ -0,0 +1,251 @@
+import json
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Dict, Hashable, Optional
+
+# Sentinel returned by LookupCache.get on a miss, so that cached falsy values
+# (empty strings, None) can still be told apart from "not cached"
+MISS = object()
+
+# How long "not found" answers and upstream failures are remembered, see configure()
+_config = {
+    'miss_ttl': 6 * 3600,
+    'error_ttl': 30,
+}
+
+def configure(miss_ttl=None, error_ttl=None):
+    """Change how long (seconds) misses and failures are cached; 0 turns either off"""
+    if miss_ttl is not None:
+        _config['miss_ttl'] = miss_ttl
+    if error_ttl is not None:
+        _config['error_ttl'] = error_ttl
+
+def get_miss_ttl():
+    return _config['miss_ttl']
+
+class RecentFailure(Exception):
+    """Raised instead of retrying an upstream call that failed moments ago"""
+
+def normalize_text(text: str, fold_case: bool = True) -> str:
+    """Normalize text for use as a cache key: trimmed, single-spaced and (by default) case-folded"""
+    text = ' '.join(text.split())
+    return text.casefold() if fold_case else text
+
+class LookupCache:
+    """
+    Disk-backed LRU cache for translation and dictionary results.
+
+    Each kind of payload lives in its own table with its own size cap, so a
+    burst of long translations can't evict the dictionary entries (or the
+    other way round). Entries expire after ``ttl`` seconds.
+    """
+
+    TABLES = ('translations', 'dictionary')
+    # Case changes what a translation means ("Polish"/"polish", "US"/"us"),
+    # while dictionary headwords are looked up case-insensitively
+    CASE_SENSITIVE = ('translations',)
+    # The file is shared by the UI, batch runs and the daemon. A lookup waits
+    # this long (seconds) for another process's write lock, then does without
+    # the cache rather than stall
+    BUSY_TIMEOUT = 0.2
+    # A hit only rewrites accessed_at once it is this old (seconds); LRU order
+    # doesn't need to be finer, and most reads then write nothing
+    TOUCH_INTERVAL = 3600
+
+    def __init__(self, filename="lookup_cache.db", max_entries=20000, ttl=30 * 24 * 3600):
+        self.filename = filename
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = {table: 0 for table in self.TABLES}
+        self.misses = {table: 0 for table in self.TABLES}
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(filename, timeout=self.BUSY_TIMEOUT, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        for table in self.TABLES:
+            self._conn.execute(f"""
+                CREATE TABLE IF NOT EXISTS {table} (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    expires_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+            """)
+            self._conn.execute(
+                f"CREATE INDEX IF NOT EXISTS {table}_accessed ON {table} (accessed_at)"
+            )
+        self._conn.commit()
+
+    @classmethod
+    def make_key(cls, table: str, text: str, src: str, dest: str) -> str:
+        return f"{src}\x1f{dest}\x1f{normalize_text(text, fold_case=table not in cls.CASE_SENSITIVE)}"
+
+    def get(self, table: str, text: str, src: str, dest: str, allow_stale: bool = False) -> Any:
+        """
+        Return the cached value, or MISS if absent, expired or unreadable.
+        Expired entries stay until evicted, and allow_stale returns them anyway
+        (for serving something while the upstream is down).
+        """
+        key = self.make_key(table, text, src, dest)
+        now = time.time()
+        with self._lock:
+            try:
+                row = self._conn.execute(
+                    f"SELECT value, expires_at, accessed_at FROM {table} WHERE key = ?", (key,)
+                ).fetchone()
+            except sqlite3.Error as e:
+                print(f"Cache read error: {e}")
+                row = None
+            if row is None or (row[1] < now and not allow_stale):
+                self.misses[table] += 1
+                return MISS
+            if row[2] < now - self.TOUCH_INTERVAL:
+                try:
+                    self._conn.execute(
+                        f"UPDATE {table} SET accessed_at = ? WHERE key = ?", (now, key)
+                    )
+                    self._conn.commit()
+                except sqlite3.Error:
+                    # Only the LRU order is lost; try again on a later hit
+                    self._conn.rollback()
+            self.hits[table] += 1
+        return json.loads(row[0])
+
+    def set(self, table: str, text: str, src: str, dest: str, value: Any, ttl: Optional[float] = None):
+        """Store a JSON-serializable value, evicting least recently used entries over the cap (best effort)"""
+        key = self.make_key(table, text, src, dest)
+        now = time.time()
+        expires_at = now + (self.ttl if ttl is None else ttl)
+        payload = json.dumps(value, ensure_ascii=False)
+        with self._lock:
+            try:
+                self._conn.execute(
+                    f"INSERT OR REPLACE INTO {table} (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                    (key, payload, expires_at, now)
+                )
+                count = self._conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                if count > self.max_entries:
+                    # Evict a little extra so we don't run this on every insert
+                    excess = count - self.max_entries + max(1, self.max_entries // 20)
+                    self._conn.execute(
+                        f"DELETE FROM {table} WHERE key IN "
+                        f"(SELECT key FROM {table} ORDER BY accessed_at LIMIT ?)",
+                        (excess,)
+                    )
+                self._conn.commit()
+            except sqlite3.Error as e:
+                # Not caching is fine; the lookup itself succeeded
+                print(f"Cache write error: {e}")
+                self._conn.rollback()
+
+    def clear(self):
+        with self._lock:
+            for table in self.TABLES:
+                self._conn.execute(f"DELETE FROM {table}")
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Hit/miss counters and current size for each table"""
+        with self._lock:
+            return {
+                table: {
+                    'hits': self.hits[table],
+                    'misses': self.misses[table],
+                    'entries': self._conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0],
+                }
+                for table in self.TABLES
+            }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+class SingleFlight:
+    """
+    Collapses concurrent calls for the same key into one: the first caller
+    runs the function, and everyone asking for that key meanwhile waits for
+    and shares its result (or exception).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, Future] = {}
+
+    def do(self, key: Hashable, function, *args, **kwargs):
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+        if not leader:
+            return future.result()
+        try:
+            result = function(*args, **kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+class FailureCache:
+    """In-memory record of recent upstream failures, kept for the configured error_ttl"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._failures: Dict[Hashable, tuple] = {}  # key -> (expires_at, message)
+
+    def check(self, key: Hashable):
+        """Raise RecentFailure if key failed within the last error_ttl seconds"""
+        with self._lock:
+            failure = self._failures.get(key)
+            if failure is None:
+                return
+            if failure[0] < time.monotonic():
+                del self._failures[key]
+                return
+        raise RecentFailure(failure[1])
+
+    def add(self, key: Hashable, error: Exception):
+        if _config['error_ttl'] <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            self._failures[key] = (now + _config['error_ttl'], str(error))
+            # Keep the map from growing without bound on a long outage
+            if len(self._failures) > 1000:
+                self._failures = {k: v for k, v in self._failures.items() if v[0] >= now}
+
+def fetch_once(key: Hashable, function, *args, **kwargs):
+    """
+    Run an upstream call through the shared single-flight group, failing
+    fast if the same call failed recently and remembering new failures.
+    """
+    _failures.check(key)
+    try:
+        return _single_flight.do(key, function, *args, **kwargs)
+    except RecentFailure:
+        raise
+    except Exception as e:
+        _failures.add(key, e)
+        raise
+
+_single_flight = SingleFlight()
+_failures = FailureCache()
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_cache() -> LookupCache:
+    """Process-wide lookup cache, opened on first use"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = LookupCache()
+    return _cache
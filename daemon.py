@@ -0,0 +1,91 @@
+import argparse
+import json
+import sys
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from upstream import set_rate
+
+DEFAULT_PORT = 8765
+DEFAULT_URL = f"http://127.0.0.1:{DEFAULT_PORT}"
+
+class DaemonClient:
+    """Thin client for a running daemon, mirroring the translator functions"""
+
+    def __init__(self, url: str = DEFAULT_URL, timeout: float = 30):
+        # Imported here like the other network clients, to keep startup light
+        import requests
+
+        self.url = url.rstrip('/')
+        self.timeout = timeout
+        self._session = requests.Session()
+        # Loopback calls must never go through a proxy from the environment
+        self._session.trust_env = False
+
+    def _post(self, path: str, payload: Dict, **kwargs):
+        response = self._session.post(f"{self.url}{path}", json=payload, timeout=self.timeout, **kwargs)
+        if response.status_code != 200:
+            try:
+                message = response.json().get('error')
+            except ValueError:
+                message = response.text
+            raise RuntimeError(f"Daemon error ({response.status_code}): {message}")
+        return response
+
+    def available(self) -> bool:
+        try:
+            return self._session.get(f"{self.url}/health", timeout=1).status_code == 200
+        except Exception:
+            return False
+
+    def translate(self, text: str, lang: Optional[str] = None) -> str:
+        return self._post('/translate', {'text': text, 'lang': lang}).json()['translation']
+
+    def get_word_info(self, text: str) -> Dict:
+        return self._post('/lookup', {'text': text}).json()
+
+    def iter_word_info(self, text: str) -> Iterator[Tuple[str, Dict]]:
+        """Same stages as translator.iter_word_info, streamed from the daemon"""
+        with self._post('/lookup', {'text': text, 'stream': True}, stream=True) as response:
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                message = json.loads(line)
+                if message['stage'] == 'error':
+                    raise RuntimeError(message['error'])
+                yield message['stage'], message['result']
+
+    def speak(self, text: str, lang: str = 'en'):
+        self._post('/speak', {'text': text, 'lang': lang})
+
+    def batch(self, words: List[str], concurrency: Optional[int] = None) -> List[Dict]:
+        return self._post('/batch', {'words': words, 'concurrency': concurrency}).json()['results']
+
+def url_argument(value: str) -> str:
+    """argparse type for --daemon: an http(s) URL, so a subcommand name isn't taken for one"""
+    if not value.startswith(('http://', 'https://')):
+        raise argparse.ArgumentTypeError(f"expected an http:// URL such as {DEFAULT_URL}, got {value!r}")
+    return value
+
+def connect(url: str) -> Optional[DaemonClient]:
+    """A client for the daemon at url, or None (after saying so) if nothing answers there"""
+    client = DaemonClient(url)
+    if client.available():
+        return client
+    print(f"No daemon at {url}, looking things up locally", file=sys.stderr)
+    return None
+
+def add_arguments(parser):
+    parser.add_argument('--host', default='127.0.0.1', help="interface to listen on (default: loopback only)")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--upstream-rate', type=float,
+                        help="requests per second allowed to each upstream service (default: 5, 3 for speech). "
+                             "This caps /batch throughput whatever its concurrency is")
+
+def main(args) -> int:
+    # The server side (http.server and friends) is only loaded to serve
+    from daemon_server import serve
+
+    if args.upstream_rate:
+        set_rate(args.upstream_rate)
+    serve(args.host, args.port)
+    return 0
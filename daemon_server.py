@@ -0,0 +1,185 @@
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict
+
+import batch
+import startup
+from cache import get_cache
+from daemon import DEFAULT_PORT
+from http_client import ensure_pool_size
+from metrics import get_metrics
+from translator import detect_language, iter_word_info, speak_english, translate_text
+
+# Limits for one request
+MAX_BODY_BYTES = 1024 * 1024
+MAX_BATCH_WORDS = 500
+MAX_BATCH_CONCURRENCY = 8
+
+class RequestError(Exception):
+    """Bad request from a client; becomes a 4xx response"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+class DaemonHandler(BaseHTTPRequestHandler):
+    """
+    JSON over HTTP on the loopback interface:
+
+        GET  /health                        status and cache statistics
+        GET  /metrics                       stage timings, Prometheus text
+        POST /translate {"text", "lang"?}   {"translation", "detected_lang"}
+        POST /lookup    {"text", "stream"?} word info; with stream, one JSON
+                                            line per stage as it finishes
+        POST /speak     {"text", "lang"?}   plays on the daemon's audio player
+        POST /batch     {"words", "concurrency"?}  {"results": [...]} in order
+    """
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        if self.path == '/health':
+            self.send_json({'status': 'ok', 'pid': os.getpid(), 'cache': get_cache().stats()})
+        elif self.path == '/metrics':
+            self.send_body(200, get_metrics().to_prometheus().encode('utf-8'), 'text/plain; version=0.0.4')
+        else:
+            self.send_json({'error': f"no such endpoint: {self.path}"}, 404)
+
+    def do_POST(self):
+        routes = {
+            '/translate': self.handle_translate,
+            '/lookup': self.handle_lookup,
+            '/speak': self.handle_speak,
+            '/batch': self.handle_batch,
+        }
+        handler = routes.get(self.path)
+        try:
+            # Read the body before anything can fail: on a keep-alive
+            # connection an unread body would be parsed as the next request
+            body = self.read_body()
+            # Web pages can reach loopback too; only accept non-browser clients
+            if self.headers.get('Origin'):
+                raise RequestError("cross-origin requests are not accepted", 403)
+            if handler is None:
+                raise RequestError(f"no such endpoint: {self.path}", 404)
+            handler(self.parse_json(body))
+        except RequestError as e:
+            self.send_json({'error': str(e)}, e.status)
+        except Exception as e:
+            print(f"Daemon request error: {e}")
+            self.close_connection = True
+            self.send_json({'error': str(e)}, 500)
+
+    def read_body(self) -> bytes:
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+        except ValueError:
+            length = -1
+        if self.headers.get('Transfer-Encoding') or not 0 <= length <= MAX_BODY_BYTES:
+            # The body is left unread, so the connection can't be reused
+            self.close_connection = True
+            raise RequestError(f"send a JSON body of at most {MAX_BODY_BYTES} bytes with a Content-Length", 413)
+        return self.rfile.read(length)
+
+    @staticmethod
+    def parse_json(body: bytes) -> Dict:
+        try:
+            payload = json.loads(body or b'{}')
+        except ValueError:
+            raise RequestError("request body is not valid JSON")
+        if not isinstance(payload, dict):
+            raise RequestError("request body must be a JSON object")
+        return payload
+
+    @staticmethod
+    def require_text(payload: Dict, field: str = 'text') -> str:
+        text = payload.get(field)
+        if not isinstance(text, str) or not text.strip():
+            raise RequestError(f"'{field}' must be a non-empty string")
+        return text.strip()
+
+    def handle_translate(self, payload):
+        text = self.require_text(payload)
+        lang = payload.get('lang') or detect_language(text)
+        self.send_json({'translation': translate_text(text, lang), 'detected_lang': lang})
+
+    def handle_lookup(self, payload):
+        text = self.require_text(payload)
+        if not payload.get('stream'):
+            for _, result in iter_word_info(text):
+                pass
+            self.send_json(result)
+            return
+
+        # One JSON line per stage, sent as it finishes
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        try:
+            for stage, result in iter_word_info(text):
+                self.send_chunk({'stage': stage, 'result': result})
+        except Exception as e:
+            self.send_chunk({'stage': 'error', 'error': str(e)})
+        self.wfile.write(b'0\r\n\r\n')
+
+    def handle_speak(self, payload):
+        text = self.require_text(payload)
+        lang = payload.get('lang') or 'en'
+        if lang == 'en':
+            speak_english(text)
+        else:
+            from audio import get_player
+            get_player().speak(text, lang=lang)
+        self.send_json({'queued': True})
+
+    def handle_batch(self, payload):
+        words = payload.get('words')
+        if not isinstance(words, list) or not all(isinstance(word, str) for word in words):
+            raise RequestError("'words' must be a list of strings")
+        if len(words) > MAX_BATCH_WORDS:
+            raise RequestError(f"at most {MAX_BATCH_WORDS} words per request", 413)
+        concurrency = payload.get('concurrency')
+        if concurrency is None:
+            concurrency = 4
+        if isinstance(concurrency, bool) or not isinstance(concurrency, int):
+            raise RequestError("'concurrency' must be an integer")
+        concurrency = max(1, min(concurrency, MAX_BATCH_CONCURRENCY))
+        words = [word.strip() for word in words if word.strip()]
+        self.send_json({'results': list(batch.iter_batch(words, concurrency))})
+
+    def send_json(self, payload, status=200):
+        self.send_body(status, json.dumps(payload, ensure_ascii=False).encode('utf-8'), 'application/json')
+
+    def send_body(self, status, body: bytes, content_type: str):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_chunk(self, payload):
+        data = (json.dumps(payload, ensure_ascii=False) + '\n').encode('utf-8')
+        self.wfile.write(f"{len(data):x}\r\n".encode('ascii') + data + b'\r\n')
+        self.wfile.flush()
+
+    def log_message(self, format, *args):
+        pass
+
+def serve(host: str = '127.0.0.1', port: int = DEFAULT_PORT):
+    """Run the daemon until interrupted; every client shares its caches and connection pools"""
+    # Sized once up front: resizing later would rebuild clients under
+    # requests already in flight
+    ensure_pool_size(MAX_BATCH_CONCURRENCY * 2)
+    server = ThreadingHTTPServer((host, port), DaemonHandler)
+    server.daemon_threads = True
+    threading.Thread(target=startup.warm_up, name='warm-up', daemon=True).start()
+    print(f"Omni Translator daemon listening on http://{host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
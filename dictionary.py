@@ -1,16 +1,21 @@
-import requests
 import re
+from html import unescape
 from typing import Dict, List, Optional
+from cache import get_cache, get_miss_ttl, fetch_once, normalize_text, RecentFailure, MISS
+from http_client import get_session, get_timeout
+from offline_dictionary import get_offline_dictionary
+from metrics import span
+from upstream import get_upstream, Throttled
 
 class CambridgeDictionary:
     """Cambridge Dictionary API integration for word definitions and examples"""
     
+    # Definitions and examples kept per entry
+    MAX_ITEMS = 3
+    
     def __init__(self):
         # https://dictionary.cambridge.org/zht/%E8%A9%9E%E5%85%B8/%E8%8B%B1%E8%AA%9E-%E6%BC%A2%E8%AA%9E-%E7%B9%81%E9%AB%94/exception?q=exceptions
         self.base_url = "https://dictionary.cambridge.org/dictionary/english/"
-        self.headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
     
     def lookup_word(self, word: str) -> Optional[Dict]:
         """
@@ -18,24 +23,44 @@ class CambridgeDictionary:
         Returns dictionary data with definitions, examples, and pronunciation
         """
         try:
-            clean_word = word
-            # Clean the word for URL
-            # clean_word = re.sub(r'[^\w\s-]', '', word.lower().strip())
-            # if not clean_word or len(clean_word.split()) > 2:
-            #     return None
-                
-            url = f"{self.base_url}{clean_word}"
-            response = requests.get(url, headers=self.headers, timeout=10)
-            
-            if response.status_code != 200:
-                return None
-                
-            return self._parse_dictionary_page(response.text, word)
-            
+            return self.fetch(word)
         except Exception as e:
             print(f"Dictionary lookup error: {e}")
             return None
     
+    def fetch(self, word: str) -> Optional[Dict]:
+        """
+        Like lookup_word, but only a missing entry returns None; network
+        errors and server errors (5xx, 429) raise
+        """
+        clean_word = word
+        # Clean the word for URL
+        # clean_word = re.sub(r'[^\w\s-]', '', word.lower().strip())
+        # if not clean_word or len(clean_word.split()) > 2:
+        #     return None
+            
+        url = f"{self.base_url}{clean_word}"
+        with span('dictionary.fetch'):
+            response = get_upstream('cambridge').call(self._get, url)
+        
+        if response.status_code != 200:
+            return None
+            
+        with span('dictionary.parse'):
+            return self._parse_dictionary_page(response.text, word)
+    
+    @staticmethod
+    def _get(url: str):
+        """One GET; throttling and server errors raise so the upstream policy retries them"""
+        response = get_session().get(url, timeout=get_timeout())
+        if response.status_code == 429:
+            raise Throttled(f"Cambridge throttled {url}")
+        if response.status_code >= 500:
+            raise RuntimeError(f"Cambridge returned HTTP {response.status_code} for {url}")
+        # Read the body here, so a hedged duplicate can't leave it half-read
+        response.text
+        return response
+    
     def _parse_dictionary_page(self, html: str, word: str) -> Optional[Dict]:
         """Parse Cambridge Dictionary HTML page to extract definitions and examples"""
         try:
@@ -46,90 +71,39 @@ class CambridgeDictionary:
                 'pronunciation': '',
                 'part_of_speech': ''
             }
+            limit = self.MAX_ITEMS
             
-            # Extract pronunciation (phonetic) - multiple patterns
-            pronunciation_patterns = [
-                r'<span class="ipa dipa lpr-2 lpl-1">([^<]+)</span>',
-                r'<span class="ipa dipa[^>]*">([^<]+)</span>',
-                r'<span class="pron dpron[^>]*">.*?<span class="ipa[^>]*">([^<]+)</span>'
-            ]
-            
-            for pattern in pronunciation_patterns:
-                pronunciation_match = re.search(pattern, html)
-                if pronunciation_match:
-                    result['pronunciation'] = pronunciation_match.group(1).strip()
-                    break
-            
-            # Extract part of speech - multiple patterns
-            pos_patterns = [
-                r'<span class="pos dpos">([^<]+)</span>',
-                r'<span class="pos[^>]*">([^<]+)</span>'
-            ]
-            
-            for pattern in pos_patterns:
-                pos_match = re.search(pattern, html)
-                if pos_match:
-                    result['part_of_speech'] = pos_match.group(1).strip()
+            # One forward pass: jump from marker to marker, read each element's
+            # text, and stop as soon as every field is filled
+            pos = 0
+            while True:
+                marker = _MARKER_RE.search(html, pos)
+                if marker is None:
                     break
-            
-            # Find pos-body sections which contain the main content
-            pos_body_pattern = r'<div class="pos-body">(.*?)</div>\s*</div>\s*</div>'
-            pos_body_matches = re.findall(pos_body_pattern, html, re.DOTALL)
-            
-            definitions = []
-            examples = []
-            
-            for pos_body in pos_body_matches:
-                # Extract definitions from def ddef_d db divs
-                def_patterns = [
-                    r'<div class="def ddef_d db">([^<]*(?:<[^/>]+>[^<]*</[^>]+>[^<]*)*)</div>',
-                    r'<div class="def ddef_d db">(.*?)</div>'
-                ]
+                tag, css_class = marker.group(1), marker.group(2)
+                end, text = _element_text(html, tag, marker.end())
+                pos = end
                 
-                for def_pattern in def_patterns:
-                    def_matches = re.findall(def_pattern, pos_body, re.DOTALL)
-                    for def_match in def_matches:
-                        # Clean up HTML tags and get text content
-                        clean_def = re.sub(r'<[^>]+>', '', def_match).strip()
-                        if clean_def and len(clean_def) > 3:  # Avoid empty or very short definitions
-                            definitions.append(clean_def)
+                if css_class == 'def ddef_d db':
+                    field = 'definitions'
+                elif css_class == 'eg deg':
+                    field = 'examples'
+                elif css_class.startswith('ipa'):
+                    field = 'pronunciation'
+                else:
+                    field = 'part_of_speech'
                 
-                # Extract examples from eg deg spans
-                example_patterns = [
-                    r'<span class="eg deg">([^<]*(?:<[^/>]+>[^<]*</[^>]+>[^<]*)*)</span>',
-                    r'<span class="eg deg">(.*?)</span>'
-                ]
+                if field in ('definitions', 'examples'):
+                    items = result[field]
+                    # Avoid empty or very short entries and duplicates
+                    if len(items) < limit and len(text) > 3 and text not in items:
+                        items.append(text)
+                elif not result[field]:
+                    result[field] = text
                 
-                for ex_pattern in example_patterns:
-                    ex_matches = re.findall(ex_pattern, pos_body, re.DOTALL)
-                    for ex_match in ex_matches:
-                        # Clean up HTML tags and get text content
-                        clean_ex = re.sub(r'<[^>]+>', '', ex_match).strip()
-                        if clean_ex and len(clean_ex) > 3:  # Avoid empty or very short examples
-                            examples.append(clean_ex)
-            
-            # Fallback: try broader patterns if pos-body didn't work
-            if not definitions:
-                def_pattern = r'<div class="def ddef_d db">(.*?)</div>'
-                definitions = re.findall(def_pattern, html, re.DOTALL)
-                definitions = [re.sub(r'<[^>]+>', '', def_text).strip() for def_text in definitions]
-                definitions = [d for d in definitions if d and len(d) > 3]
-            
-            if not examples:
-                example_pattern = r'<span class="eg deg">(.*?)</span>'
-                examples = re.findall(example_pattern, html, re.DOTALL)
-                examples = [re.sub(r'<[^>]+>', '', ex).strip() for ex in examples]
-                examples = [e for e in examples if e and len(e) > 3]
-            
-            # Limit results and remove duplicates
-            result['definitions'] = list(dict.fromkeys(definitions))[:3]
-            result['examples'] = list(dict.fromkeys(examples))[:3]
-            
-            print(f"Dictionary result for '{word}':")
-            print(f"  Definitions: {result['definitions']}")
-            print(f"  Examples: {result['examples']}")
-            print(f"  Pronunciation: {result['pronunciation']}")
-            print(f"  Part of speech: {result['part_of_speech']}")
+                if (len(result['definitions']) >= limit and len(result['examples']) >= limit
+                        and result['pronunciation'] and result['part_of_speech']):
+                    break
             
             # Only return result if we found at least one definition
             if result['definitions']:
@@ -140,9 +114,70 @@ class CambridgeDictionary:
             print(f"Dictionary parsing error: {e}")
             return None
 
+# Start tags of the elements we extract. Only the attribute value is matched,
+# never the element body, so there is nothing to backtrack over.
+_MARKER_RE = re.compile(
+    r'<(div|span) class="(def ddef_d db|eg deg|ipa(?: [^"]*)?|pos(?: [^"]*)?)"[^>]*>'
+)
+_TAG_RE = {
+    tag: re.compile(rf'<(/?){tag}\b[^>]*>')
+    for tag in ('div', 'span')
+}
+_STRIP_TAGS_RE = re.compile(r'<[^>]+>')
+
+def _element_text(html: str, tag: str, start: int):
+    """
+    Find the close tag matching an element whose body begins at ``start``.
+    Returns (index after the close tag, plain text of the body).
+    """
+    depth = 0
+    for match in _TAG_RE[tag].finditer(html, start):
+        if not match.group(1):
+            depth += 1
+        elif depth:
+            depth -= 1
+        else:
+            text = _STRIP_TAGS_RE.sub('', html[start:match.start()])
+            return match.end(), unescape(text).strip()
+    return len(html), ''
+
+_dictionary = CambridgeDictionary()
+
 def get_dictionary_info(word: str) -> Optional[Dict]:
     """
-    Convenience function to get dictionary information for a word
+    Convenience function to get dictionary information for a word.
+    The offline index is tried first, then the lookup cache, then Cambridge.
+    Words Cambridge doesn't have are cached too, for the shorter miss TTL.
     """
-    dictionary = CambridgeDictionary()
-    return dictionary.lookup_word(word)
\ No newline at end of file
+    offline = get_offline_dictionary()
+    if offline is not None:
+        with span('dictionary.offline'):
+            entry = offline.lookup(word)
+        if entry is not None:
+            return entry
+    
+    cache = get_cache()
+    with span('dictionary.cache'):
+        cached = cache.get('dictionary', word, 'en', '')
+    if cached is not MISS:
+        return cached
+
+    try:
+        # Concurrent lookups of the same word share one Cambridge fetch
+        return fetch_once(('dictionary', normalize_text(word)), _fetch_dictionary_info, word)
+    except RecentFailure as e:
+        print(f"Dictionary lookup skipped, failed recently: {e}")
+    except Exception as e:
+        print(f"Dictionary lookup error: {e}")
+    # Cambridge is failing; an expired entry beats none
+    stale = cache.get('dictionary', word, 'en', '', allow_stale=True)
+    return None if stale is MISS else stale
+
+def _fetch_dictionary_info(word: str) -> Optional[Dict]:
+    info = _dictionary.fetch(word)
+    cache = get_cache()
+    if info:
+        cache.set('dictionary', word, 'en', '', info)
+    elif get_miss_ttl() > 0:
+        cache.set('dictionary', word, 'en', '', None, ttl=get_miss_ttl())
+    return info or None
\ No newline at end of file
@@ -0,0 +1,161 @@
+from array import array
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional
+
+from storage import HistoryRecord
+
+class HistoryIndex:
+    """
+    In-memory index over history records (storage.HistoryRecord).
+
+    Keeps a case-folded input -> entries map for exact hits and a trigram
+    index over inputs and translations for substring search. Both are updated
+    in place as entries are added or removed, so nothing is rescanned per
+    keystroke. Internally every record is known by its insertion sequence
+    number, which is also what filtered views (HistoryView) hold.
+    """
+
+    GRAM_SIZE = 3
+    # Scan every entry instead of using the index once the candidates are
+    # more than this share of the history
+    SCAN_FRACTION = 0.125
+
+    def __init__(self, history=()):
+        self._records: Dict[int, HistoryRecord] = {}  # seq -> record, in history order
+        self._order: Dict[str, int] = {}             # id -> seq
+        self._haystacks: Dict[int, str] = {}         # seq -> case-folded searchable text
+        self._exact: Dict[str, List[int]] = defaultdict(list)
+        self._grams = defaultdict(set)
+        self._seq = 0
+        for entry in history:
+            self.add(entry)
+
+    def __len__(self):
+        return len(self._records)
+
+    def __contains__(self, entry_id):
+        return entry_id in self._order
+
+    def last(self) -> Optional[HistoryRecord]:
+        """The most recently added record"""
+        return next(reversed(self._records.values()), None)
+
+    def view(self, seqs: Iterable[int] = ()) -> 'HistoryView':
+        return HistoryView(self, seqs)
+
+    @staticmethod
+    def _fold(text) -> str:
+        return (text or '').casefold()
+
+    def _grams_of(self, text: str):
+        n = self.GRAM_SIZE
+        return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+    def add(self, record: HistoryRecord):
+        if record.id in self._order:
+            return
+        # NUL can't appear in a query, so a match never spans both fields
+        haystack = f"{self._fold(record.input)}\0{self._fold(record.translation)}"
+        seq = self._seq
+        self._seq += 1
+        self._records[seq] = record
+        self._order[record.id] = seq
+        self._haystacks[seq] = haystack
+        self._exact[self._fold(record.input)].append(seq)
+        for gram in self._grams_of(haystack):
+            self._grams[gram].add(seq)
+
+    def remove(self, record: HistoryRecord):
+        seq = self._order.pop(record.id, None)
+        if seq is None:
+            return
+        del self._records[seq]
+        haystack = self._haystacks.pop(seq)
+
+        key = self._fold(record.input)
+        seqs = self._exact[key]
+        seqs.remove(seq)
+        if not seqs:
+            del self._exact[key]
+
+        for gram in self._grams_of(haystack):
+            postings = self._grams[gram]
+            postings.discard(seq)
+            if not postings:
+                del self._grams[gram]
+
+    def find_exact(self, text: str) -> Optional[HistoryRecord]:
+        """Oldest record whose input equals text, ignoring case"""
+        seqs = self._exact.get(self._fold(text))
+        return self._records[seqs[0]] if seqs else None
+
+    def search(self, query: str) -> 'HistoryView':
+        """Records whose input or translation contains query, in history order"""
+        query = self._fold(query)
+        if not query:
+            return self.view(self._records)
+
+        if len(query) < self.GRAM_SIZE:
+            # Too short for the trigram index
+            return self.view(self._scan(query))
+
+        # The rarest trigram of the query narrows the candidates most; every
+        # entry containing the query is in its posting list
+        rarest = min((self._grams.get(gram, ()) for gram in self._grams_of(query)), key=len)
+        if len(rarest) > len(self) * self.SCAN_FRACTION:
+            # Most entries are candidates anyway; a scan in history order
+            # beats checking them out of order and sorting the matches
+            return self.view(self._scan(query))
+        # Sequence numbers sort into history order
+        return self.view(sorted(seq for seq in rarest if query in self._haystacks[seq]))
+
+    def _scan(self, query: str) -> List[int]:
+        # The folded haystacks save re-lowercasing every entry
+        return [seq for seq, haystack in self._haystacks.items() if query in haystack]
+
+class HistoryView:
+    """
+    Filtered list of history records, held as the records' sequence numbers
+    in the index (an array of ints, in history order) rather than as a copy.
+    Items are resolved through the index when read, so the list widget can
+    page through it, and a record's position is a binary search.
+    """
+
+    def __init__(self, index: HistoryIndex, seqs: Iterable[int] = ()):
+        self._index = index
+        self.seqs = array('q', seqs)
+
+    def __len__(self):
+        return len(self.seqs)
+
+    def __getitem__(self, position):
+        records = self._index._records
+        if isinstance(position, slice):
+            return [records[seq] for seq in self.seqs[position]]
+        return records[self.seqs[position]]
+
+    def __iter__(self):
+        records = self._index._records
+        return (records[seq] for seq in self.seqs)
+
+    def __delitem__(self, position):
+        del self.seqs[position]
+
+    def append(self, record: HistoryRecord):
+        """Add a record; it must be newer than every record already in the view"""
+        self.seqs.append(self._index._order[record.id])
+
+    def extend(self, records: Iterable[HistoryRecord]):
+        for record in records:
+            self.append(record)
+
+    def position(self, record: HistoryRecord) -> Optional[int]:
+        """Where record is in this view, or None if the view doesn't show it"""
+        seq = self._index._order.get(record.id)
+        if seq is None:
+            return None
+        position = bisect_left(self.seqs, seq)
+        if position < len(self.seqs) and self.seqs[position] == seq:
+            return position
+        return None
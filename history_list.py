@@ -0,0 +1,133 @@
+import tkinter as tk
+from tkinter import ttk
+import tkinter.font as tkfont
+
+class VirtualListbox(ttk.Frame):
+    """
+    Listbox that only renders the rows currently in view.
+
+    The full row list lives in Python (``set_items`` keeps a reference, it
+    doesn't copy). The underlying tk.Listbox only ever holds one screenful of
+    lines, and each refresh rewrites just the lines whose text changed, so
+    swapping in a new filter result or scrolling costs O(visible rows) no
+    matter how many items there are. Indexes in the public methods are
+    positions in the item list, not in the widget.
+    """
+
+    def __init__(self, parent, format_item=str, font=None, **kwargs):
+        super().__init__(parent, **kwargs)
+        self.format_item = format_item
+        self.items = []
+        self.top = 0
+        self.visible_rows = 1
+        self.selected = None
+        self.rendered = []  # text currently shown on each widget line
+
+        self.listbox = tk.Listbox(self, font=font, activestyle='none', exportselection=False)
+        self.scrollbar = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self.yview)
+        self.listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+
+        self.line_height = tkfont.Font(font=self.listbox.cget('font')).metrics('linespace') + 1
+        self.listbox.bind('<Configure>', self._on_configure)
+        self.listbox.bind('<<ListboxSelect>>', self._on_select)
+        self.listbox.bind('<MouseWheel>', self._on_mousewheel)
+        self.listbox.bind('<Button-4>', lambda event: self.yview('scroll', -3, 'units'))
+        self.listbox.bind('<Button-5>', lambda event: self.yview('scroll', 3, 'units'))
+        self.listbox.bind('<Up>', lambda event: self._move_selection(-1))
+        self.listbox.bind('<Down>', lambda event: self._move_selection(1))
+
+    def bind(self, sequence=None, func=None, add=None):
+        # Mouse and key bindings belong on the real listbox
+        return self.listbox.bind(sequence, func, add)
+
+    def set_items(self, items):
+        """Show a new list of items; only the visible lines that differ are redrawn"""
+        self.items = items
+        # An old index would point at some other item of the new list
+        self.selected = None
+        self.refresh()
+
+    def refresh(self):
+        """Re-render the visible window after self.items changed"""
+        self.top = max(0, min(self.top, len(self.items) - self.visible_rows))
+        window = [
+            self.format_item(item)
+            for item in self.items[self.top:self.top + self.visible_rows]
+        ]
+
+        for row, text in enumerate(window):
+            if row < len(self.rendered):
+                if self.rendered[row] != text:
+                    self.listbox.delete(row)
+                    self.listbox.insert(row, text)
+            else:
+                self.listbox.insert(tk.END, text)
+        if len(self.rendered) > len(window):
+            self.listbox.delete(len(window), tk.END)
+        self.rendered = window
+
+        self.listbox.selection_clear(0, tk.END)
+        if self.selected is not None and self.top <= self.selected < self.top + len(window):
+            self.listbox.selection_set(self.selected - self.top)
+
+        total = len(self.items)
+        if total:
+            self.scrollbar.set(self.top / total, min(1.0, (self.top + self.visible_rows) / total))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+    def yview(self, *args):
+        """Scrollbar protocol: ('moveto', fraction) or ('scroll', n, 'units'|'pages')"""
+        if args[0] == 'moveto':
+            self.top = int(float(args[1]) * len(self.items))
+        elif args[0] == 'scroll':
+            step = int(args[1])
+            if args[2] == 'pages':
+                step *= max(1, self.visible_rows - 1)
+            self.top += step
+        self.refresh()
+
+    def see(self, index):
+        if index < self.top:
+            self.top = index
+        elif index >= self.top + self.visible_rows:
+            self.top = index - self.visible_rows + 1
+        self.refresh()
+
+    def curselection(self):
+        return () if self.selected is None else (self.selected,)
+
+    def selection_set(self, index):
+        self.selected = index
+        self.refresh()
+
+    def selection_clear(self):
+        self.selected = None
+        self.listbox.selection_clear(0, tk.END)
+
+    def _on_configure(self, event):
+        rows = max(1, event.height // self.line_height)
+        if rows != self.visible_rows:
+            self.visible_rows = rows
+            self.refresh()
+
+    def _on_select(self, event):
+        selection = self.listbox.curselection()
+        if selection:
+            self.selected = self.top + selection[0]
+
+    def _on_mousewheel(self, event):
+        self.yview('scroll', -3 if event.delta > 0 else 3, 'units')
+        return 'break'
+
+    def _move_selection(self, step):
+        if not self.items:
+            return 'break'
+        if self.selected is None:
+            index = self.top
+        else:
+            index = max(0, min(len(self.items) - 1, self.selected + step))
+        self.selected = index
+        self.see(index)
+        return 'break'
@@ -0,0 +1,102 @@
+import importlib.util
+import threading
+
+DEFAULT_USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+
+# Process-wide client settings, see configure()
+_config = {
+    'pool_size': 10,
+    'timeout': 10,
+    'http2': True,
+}
+
+_lock = threading.Lock()
+_session = None
+_translator = None
+
+def configure(pool_size=None, timeout=None, http2=None):
+    """
+    Change connection pool size, timeout (seconds) or HTTP/2 preference.
+    Existing clients are closed and rebuilt on next use.
+    """
+    if pool_size is not None:
+        _config['pool_size'] = pool_size
+    if timeout is not None:
+        _config['timeout'] = timeout
+    if http2 is not None:
+        _config['http2'] = http2
+    close()
+
+def get_timeout():
+    return _config['timeout']
+
+def ensure_pool_size(pool_size):
+    """Grow the connection pools so ``pool_size`` requests can run at once"""
+    if pool_size > _config['pool_size']:
+        configure(pool_size=pool_size)
+
+def http2_available() -> bool:
+    """HTTP/2 needs the optional h2 package next to httpx"""
+    return importlib.util.find_spec('h2') is not None
+
+def get_session():
+    """Shared keep-alive session used for dictionary page fetches"""
+    global _session
+    if _session is None:
+        with _lock:
+            if _session is None:
+                # Imported on first use to keep startup light
+                import requests
+                from requests.adapters import HTTPAdapter
+                
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=_config['pool_size'],
+                    pool_maxsize=_config['pool_size'],
+                )
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                session.headers.update({'User-Agent': DEFAULT_USER_AGENT})
+                _session = session
+    return _session
+
+def get_translator():
+    """Shared googletrans Translator whose httpx client keeps connections alive"""
+    global _translator
+    if _translator is None:
+        with _lock:
+            if _translator is None:
+                import httpx
+                from googletrans import Translator
+                
+                http2 = _config['http2'] and http2_available()
+                timeout = httpx.Timeout(_config['timeout'])
+                translator = Translator(timeout=timeout, http2=http2)
+                # googletrans builds its client with default pool limits; swap in
+                # one sized from our config, keeping the headers it set up
+                client = httpx.Client(
+                    http2=http2,
+                    timeout=timeout,
+                    pool_limits=httpx.PoolLimits(
+                        max_keepalive=_config['pool_size'],
+                        max_connections=_config['pool_size'] * 2,
+                    ),
+                    headers=translator.client.headers,
+                )
+                translator.client.close()
+                translator.client = client
+                if hasattr(translator, 'token_acquirer'):
+                    translator.token_acquirer.client = client
+                _translator = translator
+    return _translator
+
+def close():
+    """Close the shared clients; they are recreated lazily"""
+    global _session, _translator
+    with _lock:
+        if _session is not None:
+            _session.close()
+            _session = None
+        if _translator is not None:
+            _translator.client.close()
+            _translator = None
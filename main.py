@@ -1,9 +1,57 @@
-from ui import TranslatorUI
+import startup
+import argparse
+import os
+import sys
 
-def main():
-    app = TranslatorUI()
+import batch
+import daemon
+import offline_dictionary
+from metrics import get_metrics
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="omni-translator")
+    subcommands = parser.add_subparsers(dest="command")
+    
+    batch_parser = subcommands.add_parser("batch", help="translate a word list to JSONL without opening the window")
+    batch.add_arguments(batch_parser)
+    
+    import_parser = subcommands.add_parser("import-dictionary", help="build the offline dictionary from a dump")
+    offline_dictionary.add_arguments(import_parser)
+    
+    serve_parser = subcommands.add_parser("serve", help="run the local translation daemon")
+    daemon.add_arguments(serve_parser)
+    
+    parser.add_argument("--daemon", metavar="URL", type=daemon.url_argument, default=os.environ.get("OMNI_DAEMON_URL"),
+                        help=f"look things up through the daemon at URL, e.g. {daemon.DEFAULT_URL}")
+    parser.add_argument("--timing", action="store_true",
+                        default=bool(os.environ.get("OMNI_STARTUP_TIMING")),
+                        help="print startup timing after the first result")
+    parser.add_argument("--prefetch", action="store_true",
+                        help="start with typeahead prefetch turned on")
+    parser.add_argument("--metrics", metavar="FILE", default=os.environ.get("OMNI_METRICS_FILE"),
+                        help="keep stage timings in FILE (.prom for Prometheus text, else JSON)")
+    
+    args = parser.parse_args(argv)
+    if args.metrics:
+        get_metrics().start_export(args.metrics)
+    if args.command == "batch":
+        return batch.main(args)
+    if args.command == "import-dictionary":
+        return offline_dictionary.main(args)
+    if args.command == "serve":
+        return daemon.main(args)
+    
+    # Imported here so headless commands don't need a display or hotkey hook
+    startup.enabled = args.timing
+    startup.mark('main')
+    from ui import TranslatorUI
+    startup.mark('ui_imported')
+    client = daemon.connect(args.daemon) if args.daemon else None
+    app = TranslatorUI(prefetch=args.prefetch, client=client)
+    startup.mark('window_created')
     print("Omni Translator started. Press Ctrl+Alt+T to toggle the window.")
     app.run()
+    return 0
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
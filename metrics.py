@@ -0,0 +1,175 @@
+import atexit
+import bisect
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+# Histogram bucket upper bounds in seconds, Prometheus style
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class StageHistogram:
+    """
+    Timings of one stage: cumulative bucket counts since start, plus the
+    samples of the last ``window`` seconds for recent percentiles.
+    """
+
+    def __init__(self, window: float = 300.0, max_samples: int = 2048):
+        self.window = window
+        self.counts = [0] * (len(BUCKETS) + 1)   # last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.recent = deque(maxlen=max_samples)  # (monotonic time, seconds)
+
+    def observe(self, seconds: float):
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        self.recent.append((time.monotonic(), seconds))
+
+    def recent_samples(self):
+        cutoff = time.monotonic() - self.window
+        while self.recent and self.recent[0][0] < cutoff:
+            self.recent.popleft()
+        return sorted(seconds for _, seconds in self.recent)
+
+class Metrics:
+    """
+    Process-wide stage timings, fed by ``span()``. They can be written out
+    as Prometheus text (.prom/.txt) or JSON (anything else), either on demand
+    or periodically by ``start_export``.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stages: Dict[str, StageHistogram] = {}
+        self._export_path = None
+
+    def observe(self, stage: str, seconds: float):
+        with self._lock:
+            histogram = self._stages.get(stage)
+            if histogram is None:
+                histogram = self._stages[stage] = StageHistogram()
+            histogram.observe(seconds)
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            stages = {}
+            for stage, histogram in sorted(self._stages.items()):
+                recent = histogram.recent_samples()
+                cumulative = 0
+                buckets = {}
+                for bound, count in zip(BUCKETS + ('+Inf',), histogram.counts):
+                    cumulative += count
+                    buckets[str(bound)] = cumulative
+                stages[stage] = {
+                    'count': histogram.count,
+                    'sum_s': round(histogram.sum, 6),
+                    'buckets': buckets,
+                    'recent': {
+                        'count': len(recent),
+                        'p50_ms': _percentile_ms(recent, 50),
+                        'p95_ms': _percentile_ms(recent, 95),
+                        'p99_ms': _percentile_ms(recent, 99),
+                    },
+                }
+        return {'generated_at': time.time(), 'stages': stages}
+
+    def to_prometheus(self) -> str:
+        snapshot = self.snapshot()
+        lines = [
+            "# HELP omni_stage_seconds Time spent in each lookup stage",
+            "# TYPE omni_stage_seconds histogram",
+        ]
+        for stage, stats in snapshot['stages'].items():
+            for bound, count in stats['buckets'].items():
+                lines.append(f'omni_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {count}')
+            lines.append(f'omni_stage_seconds_sum{{stage="{stage}"}} {stats["sum_s"]}')
+            lines.append(f'omni_stage_seconds_count{{stage="{stage}"}} {stats["count"]}')
+        lines += [
+            "# HELP omni_stage_recent_seconds Stage time percentiles over the last few minutes",
+            "# TYPE omni_stage_recent_seconds summary",
+        ]
+        for stage, stats in snapshot['stages'].items():
+            for quantile in ('50', '95', '99'):
+                value = stats['recent'][f'p{quantile}_ms']
+                if value is not None:
+                    lines.append(
+                        f'omni_stage_recent_seconds{{stage="{stage}",quantile="0.{quantile}"}} {value / 1000:.6f}'
+                    )
+        return '\n'.join(lines) + '\n'
+
+    def export(self, path: Optional[str] = None):
+        """Write the metrics to path (atomic replace)"""
+        path = path or self._export_path
+        if not path:
+            return
+        if os.path.splitext(path)[1].lower() in ('.prom', '.txt'):
+            content = self.to_prometheus()
+        else:
+            content = json.dumps(self.snapshot(), indent=2, ensure_ascii=False) + '\n'
+        tmp_path = f"{path}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(content)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            print(f"Error exporting metrics: {e}")
+
+    def start_export(self, path: str, interval: float = 15.0):
+        """Rewrite path every ``interval`` seconds and once more at exit"""
+        self._export_path = path
+
+        def loop():
+            while True:
+                time.sleep(interval)
+                self.export()
+
+        threading.Thread(target=loop, name='metrics-export', daemon=True).start()
+        atexit.register(self.export)
+
+def _percentile_ms(sorted_samples, pct) -> Optional[float]:
+    if not sorted_samples:
+        return None
+    rank = max(1, -(-len(sorted_samples) * pct // 100))
+    return round(sorted_samples[int(rank) - 1] * 1000, 3)
+
+_metrics = Metrics()
+_local = threading.local()
+# Several threads may add to one trace (parallel stages, segments)
+_trace_lock = threading.Lock()
+
+def get_metrics() -> Metrics:
+    return _metrics
+
+@contextmanager
+def trace(timings: Dict):
+    """Also record spans finished on this thread into timings (stage -> ms)"""
+    previous = getattr(_local, 'timings', None)
+    _local.timings = timings
+    try:
+        yield timings
+    finally:
+        _local.timings = previous
+
+def traced(timings: Dict, function, *args, **kwargs):
+    """Call function with spans traced into timings; for handing work to another thread"""
+    with trace(timings):
+        return function(*args, **kwargs)
+
+@contextmanager
+def span(stage: str):
+    """Time a block into the stage histogram and the current trace, if any"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - started
+        _metrics.observe(stage, seconds)
+        timings = getattr(_local, 'timings', None)
+        if timings is not None:
+            with _trace_lock:
+                timings[stage] = round(timings.get(stage, 0) + seconds * 1000, 1)
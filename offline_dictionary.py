@@ -0,0 +1,200 @@
+import csv
+import json
+import os
+import sqlite3
+import threading
+from typing import Dict, Iterable, Iterator, Optional
+
+from cache import normalize_text
+
+class OfflineDictionary:
+    """
+    Local dictionary index imported from an open dictionary dump.
+
+    Entries have the same shape as CambridgeDictionary results (definitions,
+    examples, pronunciation, part_of_speech) and live in one SQLite table
+    keyed by normalized word. The file is memory-mapped for reads, so a
+    lookup is a single B-tree probe without touching the network.
+    """
+
+    # Same per-entry limit as the Cambridge scraper
+    MAX_ITEMS = 3
+
+    def __init__(self, filename="offline_dictionary.db"):
+        self.filename = filename
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(filename, check_same_thread=False)
+        self._conn.execute('PRAGMA mmap_size=268435456')
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                word TEXT PRIMARY KEY,
+                payload TEXT NOT NULL
+            ) WITHOUT ROWID
+        """)
+        self._conn.commit()
+
+    def lookup(self, word: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT payload FROM entries WHERE word = ?", (normalize_text(word),)
+            ).fetchone()
+        if row is None:
+            return None
+        entry = json.loads(row[0])
+        entry['word'] = word
+        return entry
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def import_entries(self, entries: Iterable[Dict], batch_size: int = 5000) -> int:
+        """
+        Merge entries into the index. Entries for the same word (for example
+        one per part of speech, or a word already in the index) are combined,
+        keeping the first few definitions and examples. Entries are written in
+        batches, so dumps larger than memory can be imported. Returns the
+        number of entries read.
+        """
+        pending: Dict[str, Dict] = {}
+        count = 0
+        for entry in entries:
+            key = normalize_text(entry.get('word') or '')
+            if not key:
+                continue
+            self._merge(pending.setdefault(key, self._empty_entry()), entry)
+            count += 1
+            if len(pending) >= batch_size:
+                self._write(pending)
+                pending = {}
+        self._write(pending)
+        return count
+
+    @staticmethod
+    def _empty_entry() -> Dict:
+        return {
+            'definitions': [],
+            'examples': [],
+            'pronunciation': '',
+            'part_of_speech': '',
+        }
+
+    def _merge(self, target: Dict, entry: Dict):
+        for field in ('definitions', 'examples'):
+            for item in entry.get(field) or []:
+                item = item.strip()
+                if item and item not in target[field] and len(target[field]) < self.MAX_ITEMS:
+                    target[field].append(item)
+        for field in ('pronunciation', 'part_of_speech'):
+            if not target[field] and entry.get(field):
+                target[field] = entry[field].strip()
+
+    def _write(self, pending: Dict[str, Dict]):
+        with self._lock:
+            rows = []
+            for key, entry in pending.items():
+                row = self._conn.execute("SELECT payload FROM entries WHERE word = ?", (key,)).fetchone()
+                if row is not None:
+                    existing = json.loads(row[0])
+                    self._merge(existing, entry)
+                    entry = existing
+                if entry['definitions']:
+                    rows.append((key, json.dumps(entry, ensure_ascii=False)))
+            self._conn.executemany("INSERT OR REPLACE INTO entries (word, payload) VALUES (?, ?)", rows)
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+def read_wiktionary(path: str) -> Iterator[Dict]:
+    """Read a Wiktionary JSONL extract (kaikki.org / wiktextract format), English entries only"""
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if record.get('lang_code', 'en') != 'en':
+                continue
+            definitions = []
+            examples = []
+            for sense in record.get('senses') or []:
+                definitions.extend(sense.get('glosses') or [])
+                examples.extend(example['text'] for example in sense.get('examples') or [] if example.get('text'))
+            ipa = next((sound['ipa'] for sound in record.get('sounds') or [] if sound.get('ipa')), '')
+            yield {
+                'word': record.get('word'),
+                'definitions': definitions,
+                'examples': examples,
+                # The UI adds the slashes itself
+                'pronunciation': ipa.strip('/[]'),
+                'part_of_speech': record.get('pos', ''),
+            }
+
+def read_json(path: str) -> Iterator[Dict]:
+    """
+    Read a user-supplied JSON file: either a list of entries with a 'word'
+    key, or an object mapping each word to its entry.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        for word, entry in data.items():
+            yield dict(entry, word=word)
+    else:
+        yield from data
+
+def read_csv(path: str) -> Iterator[Dict]:
+    """
+    Read a CSV with a header row: word, definition, example, pronunciation,
+    part_of_speech. Several rows for the same word are merged on import.
+    """
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        for row in csv.DictReader(f):
+            yield {
+                'word': row.get('word'),
+                'definitions': [row['definition']] if row.get('definition') else [],
+                'examples': [row['example']] if row.get('example') else [],
+                'pronunciation': row.get('pronunciation') or '',
+                'part_of_speech': row.get('part_of_speech') or '',
+            }
+
+READERS = {
+    'wiktionary': read_wiktionary,
+    'json': read_json,
+    'csv': read_csv,
+}
+
+def import_file(path: str, format: Optional[str] = None, filename: str = "offline_dictionary.db") -> int:
+    """Import a dump into the offline index; format is guessed from the extension if not given"""
+    if format is None:
+        extension = os.path.splitext(path)[1].lower()
+        format = {'.jsonl': 'wiktionary', '.json': 'json', '.csv': 'csv'}.get(extension)
+        if format is None:
+            raise ValueError(f"Can't tell the format of {path}; pass one of {', '.join(READERS)}")
+    dictionary = OfflineDictionary(filename)
+    try:
+        return dictionary.import_entries(READERS[format](path))
+    finally:
+        dictionary.close()
+
+_offline = None
+_offline_lock = threading.Lock()
+
+def get_offline_dictionary(filename="offline_dictionary.db") -> Optional[OfflineDictionary]:
+    """The imported offline index, or None if nothing has been imported yet"""
+    global _offline
+    if _offline is None and os.path.exists(filename):
+        with _offline_lock:
+            if _offline is None:
+                _offline = OfflineDictionary(filename)
+    return _offline
+
+def add_arguments(parser):
+    parser.add_argument('path', help="dictionary dump to import")
+    parser.add_argument('--format', choices=sorted(READERS), help="dump format (default: guess from extension)")
+
+def main(args) -> int:
+    count = import_file(args.path, args.format)
+    print(f"Imported {count} entries into the offline dictionary")
+    return 0
@@ -0,0 +1,127 @@
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+from translator import detect_language, iter_word_info
+from audio import split_for_speech, synthesize
+
+class Prefetcher:
+    """
+    Speculative lookups for typeahead.
+
+    ``request(text)`` starts a low-priority lookup (translation, dictionary
+    and speech) for text the user is still typing. Results are parked for
+    ``ttl`` seconds and handed out once by ``take(text)`` when Enter is
+    pressed. A newer request or ``cancel()`` makes any earlier prefetch stop
+    at its next stage.
+
+    Prefetches run one at a time on their own thread, never more than
+    ``max_per_minute`` of them start, and they back off entirely while a real
+    lookup is in flight (see ``foreground()``), so they only use spare
+    capacity. With a daemon client the lookup runs in the daemon, which keeps
+    the result in its caches.
+    """
+
+    def __init__(self, ttl: float = 60.0, max_entries: int = 32, max_per_minute: int = 30, client=None):
+        self.client = client
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_per_minute = max_per_minute
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='prefetch')
+        self._lock = threading.Lock()
+        self._results = OrderedDict()  # text -> (expires_at, word_info)
+        self._started = deque()        # start times within the last minute
+        self._generation = 0
+        self._future = None
+        self._foreground = 0
+
+    def request(self, text: str):
+        """Prefetch text, superseding any earlier prefetch"""
+        with self._lock:
+            self._generation += 1
+            if self._future is not None:
+                self._future.cancel()
+            if self._fresh(text) is not None:
+                return
+            self._future = self._executor.submit(self._run, self._generation, text)
+
+    def cancel(self):
+        with self._lock:
+            self._generation += 1
+            if self._future is not None:
+                self._future.cancel()
+                self._future = None
+
+    def take(self, text: str) -> Optional[Dict]:
+        """Prefetched word info for text, if it finished and hasn't expired"""
+        with self._lock:
+            word_info = self._fresh(text)
+            self._results.pop(text, None)
+            return word_info
+
+    @contextmanager
+    def foreground(self):
+        """Wrap a real lookup; prefetches stand down until it finishes"""
+        with self._lock:
+            self._foreground += 1
+            self._generation += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._foreground -= 1
+
+    def shutdown(self):
+        self.cancel()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _fresh(self, text: str) -> Optional[Dict]:
+        entry = self._results.get(text)
+        if entry is None or entry[0] < time.monotonic():
+            return None
+        return entry[1]
+
+    def _is_current(self, generation: int) -> bool:
+        return generation == self._generation and not self._foreground
+
+    def _within_budget(self) -> bool:
+        now = time.monotonic()
+        while self._started and self._started[0] < now - 60:
+            self._started.popleft()
+        if len(self._started) >= self.max_per_minute:
+            return False
+        self._started.append(now)
+        return True
+
+    def _run(self, generation: int, text: str):
+        with self._lock:
+            if not self._is_current(generation) or not self._within_budget():
+                return
+        try:
+            if self.client is not None:
+                word_info = self.client.get_word_info(text)
+            else:
+                lang = detect_language(text)
+                word_info = None
+                # Stages run inline: a prefetch holds at most one connection
+                for _, word_info in iter_word_info(text, lang, concurrent=False):
+                    if not self._is_current(generation):
+                        return
+                english_text = word_info['translation'] if lang in ['zh-cn', 'zh-tw', 'zh'] else text
+                chunks = split_for_speech(english_text or '')
+                if chunks:
+                    # Lands in the audio cache, so playback starts right away;
+                    # later chunks are synthesized while the first one plays
+                    synthesize(chunks[0], lang='en')
+        except Exception as e:
+            print(f"Prefetch error: {e}")
+            return
+
+        with self._lock:
+            self._results[text] = (time.monotonic() + self.ttl, dict(word_info))
+            self._results.move_to_end(text)
+            while len(self._results) > self.max_entries:
+                self._results.popitem(last=False)
@@ -0,0 +1,80 @@
+import importlib
+import threading
+import time
+
+# Everything is measured from the moment this module is first imported,
+# which main.py does before anything else
+_start = time.perf_counter()
+_lock = threading.Lock()
+_marks = {}
+_imports = {}
+
+# Set by `main.py --timing`; the report is printed after the first result
+enabled = False
+_reported = False
+
+def mark(name):
+    """Record the first time a startup milestone is reached"""
+    with _lock:
+        _marks.setdefault(name, time.perf_counter() - _start)
+
+def timed_import(module_name):
+    """Import a module and record how long the first import took"""
+    started = time.perf_counter()
+    module = importlib.import_module(module_name)
+    with _lock:
+        _imports.setdefault(module_name, time.perf_counter() - started)
+    return module
+
+def warm_up():
+    """
+    Load the heavy dependencies and open upstream connections ahead of the
+    first lookup. Meant to run on a background thread once the window is up;
+    every step is best effort.
+    """
+    for module_name in ('langdetect', 'gtts', 'pygame', 'requests', 'httpx', 'googletrans'):
+        try:
+            timed_import(module_name)
+        except ImportError as e:
+            print(f"Warm-up import error: {e}")
+
+    from translator import _detect_with_langdetect
+    from audio import get_player
+    from cache import get_cache
+    from http_client import get_session, get_timeout, get_translator
+    from dictionary import _dictionary
+
+    steps = [
+        # Mixed-script text always reaches langdetect, which loads its profiles
+        ('langdetect profiles', lambda: _detect_with_langdetect('warm up 暖身')),
+        ('audio mixer', get_player),
+        ('lookup cache', get_cache),
+        ('cambridge connection', lambda: get_session().head(_dictionary.base_url, timeout=get_timeout())),
+        ('google connection', lambda: get_translator().client.head(f"https://{get_translator().service_urls[0]}/")),
+    ]
+    for name, step in steps:
+        started = time.perf_counter()
+        try:
+            step()
+        except Exception as e:
+            print(f"Warm-up error ({name}): {e}")
+        with _lock:
+            _imports.setdefault(f"[{name}]", time.perf_counter() - started)
+    mark('warm_up_done')
+
+def report() -> str:
+    with _lock:
+        lines = ["=== Startup timing ==="]
+        for name, seconds in sorted(_marks.items(), key=lambda item: item[1]):
+            lines.append(f"  {name:<28}{seconds * 1000:>9.1f} ms")
+        lines.append("  -- imports / warm-up steps --")
+        for name, seconds in _imports.items():
+            lines.append(f"  {name:<28}{seconds * 1000:>9.1f} ms")
+    return '\n'.join(lines)
+
+def report_once():
+    """Print the report the first time it's asked for, if timing is enabled"""
+    global _reported
+    if enabled and not _reported:
+        _reported = True
+        print(report())
@@ -1,25 +1,278 @@
 import json
 import os
+import queue
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+class HistoryRecord:
+    """
+    The part of a history entry the list and search need. The full entry
+    (dictionary data, timings...) stays in the journal and is read back with
+    HistoryStorage.load_entry; ``offset`` is where its "add" line starts.
+    """
+
+    __slots__ = ('id', 'input', 'translation', 'offset')
+
+    def __init__(self, id: str, input: str, translation: Optional[str] = None, offset: Optional[int] = None):
+        self.id = id
+        self.input = input
+        self.translation = translation
+        self.offset = offset
+
+    @classmethod
+    def from_entry(cls, entry: Dict, offset: Optional[int] = None) -> 'HistoryRecord':
+        return cls(entry['id'], entry.get('input') or '', entry.get('translation'), offset)
 
 class HistoryStorage:
-    def __init__(self, filename="translation_history.json"):
+    """
+    Translation history kept as an append-only JSONL journal.
+
+    Every line is one operation, either ``{"op": "add", "entry": {...}}`` or
+    ``{"op": "delete", "id": ...}``, so adding or deleting an entry costs one
+    short write no matter how large the history is. Writes are batched on a
+    background thread. A torn last line from a crash is dropped on load,
+    malformed lines elsewhere are skipped, and the journal is compacted on
+    load once deleted entries pile up.
+
+    Loading returns HistoryRecords rather than full entries; a full entry is
+    read from its journal line when needed, and the last few are kept in a
+    small LRU.
+    """
+
+    # Compact when the journal has this many more lines than live entries
+    COMPACT_SLACK = 1000
+    # Full entries kept in memory after load_entry
+    PAYLOAD_CACHE_SIZE = 64
+
+    def __init__(self, filename="translation_history.jsonl", legacy_filename="translation_history.json"):
         self.filename = filename
-    
-    def save_history(self, history):
-        """Save translation history to JSON file"""
+        self.legacy_filename = legacy_filename
+        self._queue = queue.Queue()
+        # Serializes journal appends with loading/compaction, which may run
+        # on another thread while the UI is already adding entries
+        self._file_lock = threading.RLock()
+        self._payload_lock = threading.Lock()
+        self._payloads = OrderedDict()  # id -> full entry, most recently used last
+        self._unwritten = {}            # id -> full entry still waiting in the queue
+        self._writer = threading.Thread(target=self._write_loop, name='history-writer', daemon=True)
+        self._writer.start()
+
+    @staticmethod
+    def new_id() -> str:
+        return uuid.uuid4().hex
+
+    def append(self, entry) -> HistoryRecord:
+        """Journal a new entry, giving it a stable 'id' if it has none"""
+        entry.setdefault('id', self.new_id())
+        record = HistoryRecord.from_entry(entry)
+        with self._payload_lock:
+            self._unwritten[record.id] = entry
+        self._queue.put(({'op': 'add', 'entry': entry}, record))
+        return record
+
+    def delete(self, entry_id):
+        with self._payload_lock:
+            self._payloads.pop(entry_id, None)
+        self._queue.put(({'op': 'delete', 'id': entry_id}, None))
+
+    def load_entry(self, record: HistoryRecord) -> Dict:
+        """The full entry behind a record, from the LRU or the journal"""
+        with self._payload_lock:
+            entry = self._payloads.get(record.id)
+            if entry is not None:
+                self._payloads.move_to_end(record.id)
+                return entry
+            entry = self._unwritten.get(record.id)
+        if entry is None:
+            entry = self._read_entry(record)
+        with self._payload_lock:
+            self._payloads[record.id] = entry
+            while len(self._payloads) > self.PAYLOAD_CACHE_SIZE:
+                self._payloads.popitem(last=False)
+        return entry
+
+    @staticmethod
+    def _read_at(f, record: HistoryRecord) -> Optional[Dict]:
+        """The entry at record.offset in the open journal, if that's still its line"""
+        if record.offset is None:
+            return None
+        f.seek(record.offset)
+        try:
+            op = json.loads(f.readline())
+        except ValueError:
+            return None
+        if op.get('op') == 'add' and op['entry']['id'] == record.id:
+            return op['entry']
+        return None
+
+    def _read_entry(self, record: HistoryRecord) -> Dict:
         try:
-            with open(self.filename, 'w', encoding='utf-8') as f:
-                json.dump(history, f, ensure_ascii=False, indent=2)
+            with self._file_lock, open(self.filename, 'rb') as f:
+                entry = self._read_at(f, record)
+                if entry is not None:
+                    return entry
+                # The journal was rewritten under us; find the line again
+                f.seek(0)
+                offset = 0
+                found = None
+                for raw_line in f:
+                    if record.id.encode('utf-8') in raw_line:
+                        try:
+                            op = json.loads(raw_line)
+                        except ValueError:
+                            op = {}
+                        if op.get('op') == 'add' and op['entry']['id'] == record.id:
+                            found = op['entry']
+                            record.offset = offset
+                    offset += len(raw_line)
+                if found is not None:
+                    return found
+        except Exception as e:
+            print(f"Error loading history entry: {e}")
+        # Lost from the journal; show what the record still knows
+        return {
+            'id': record.id,
+            'input': record.input,
+            'translation': record.translation,
+            'detected_lang': '',
+            'english_text': record.input,
+            'dictionary': None,
+            'timestamp': '',
+        }
+
+    def flush(self):
+        """Block until every queued operation is on disk"""
+        self._queue.join()
+
+    def close(self):
+        self._queue.put(None)
+        self._writer.join()
+
+    def _write_loop(self):
+        while True:
+            op = self._queue.get()
+            batch = [op]
+            # Pick up whatever else queued up meanwhile and write it in one go
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            ops = [item for item in batch if item is not None]
+            try:
+                if ops:
+                    lines = [(json.dumps(op, ensure_ascii=False) + '\n').encode('utf-8') for op, _ in ops]
+                    with self._file_lock, open(self.filename, 'ab') as f:
+                        offset = f.seek(0, os.SEEK_END)
+                        f.write(b''.join(lines))
+                        f.flush()
+                        os.fsync(f.fileno())
+                        for (op, record), line in zip(ops, lines):
+                            if record is not None:
+                                record.offset = offset
+                            offset += len(line)
+                    with self._payload_lock:
+                        for op, record in ops:
+                            if record is not None:
+                                self._unwritten.pop(record.id, None)
+            except Exception as e:
+                print(f"Error saving history: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+            if len(ops) != len(batch):
+                return
+
+    def _rewrite(self, history) -> List[HistoryRecord]:
+        """Make the journal hold exactly ``history``, given as records or full entries (atomic replace)"""
+        tmp_filename = f"{self.filename}.tmp"
+        records = []
+        offsets = []
+        try:
+            with self._file_lock:
+                source = open(self.filename, 'rb') if os.path.exists(self.filename) else None
+                try:
+                    with open(tmp_filename, 'wb') as f:
+                        offset = 0
+                        for item in history:
+                            if isinstance(item, HistoryRecord):
+                                record = item
+                                entry = self._read_at(source, record) if source else None
+                                if entry is None:
+                                    entry = self._read_entry(record)
+                            else:
+                                entry = item
+                                entry.setdefault('id', self.new_id())
+                                record = HistoryRecord.from_entry(entry)
+                            line = (json.dumps({'op': 'add', 'entry': entry}, ensure_ascii=False) + '\n').encode('utf-8')
+                            f.write(line)
+                            records.append(record)
+                            offsets.append(offset)
+                            offset += len(line)
+                        f.flush()
+                        os.fsync(f.fileno())
+                finally:
+                    if source:
+                        source.close()
+                os.replace(tmp_filename, self.filename)
+                # Only valid once the new journal is in place
+                for record, offset in zip(records, offsets):
+                    record.offset = offset
         except Exception as e:
             print(f"Error saving history: {e}")
-    
-    def load_history(self):
-        """Load translation history from JSON file"""
+        return records
+
+    def load_history(self) -> List[HistoryRecord]:
+        """Replay the journal (or migrate the old JSON file) into a list of records"""
+        with self._file_lock:
+            return self._load()
+
+    def _load(self):
         try:
-            if os.path.exists(self.filename):
-                with open(self.filename, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            return []
+            if not os.path.exists(self.filename):
+                return self._migrate_legacy()
+
+            records = {}
+            line_count = 0
+            offset = 0
+            with open(self.filename, 'rb') as f:
+                for raw_line in f:
+                    if not raw_line.endswith(b'\n'):
+                        # Only the last line can lack its newline: a write torn
+                        # by a crash, which is cut off below
+                        break
+                    line_count += 1
+                    try:
+                        op = json.loads(raw_line)
+                        if op['op'] == 'add':
+                            # Only the listing fields are kept; the parsed line is dropped
+                            records[op['entry']['id']] = HistoryRecord.from_entry(op['entry'], offset)
+                        elif op['op'] == 'delete':
+                            records.pop(op['id'], None)
+                    except (ValueError, KeyError, TypeError):
+                        # A write that failed mid-session (disk full...); the
+                        # lines after it are still good
+                        print(f"Skipping malformed history line {line_count}")
+                    offset += len(raw_line)
+
+            if offset != os.path.getsize(self.filename):
+                with open(self.filename, 'r+b') as f:
+                    f.truncate(offset)
+
+            history = list(records.values())
+            if line_count > len(history) + self.COMPACT_SLACK:
+                self._rewrite(history)
+            return history
         except Exception as e:
             print(f"Error loading history: {e}")
-            return []
\ No newline at end of file
+            return []
+
+    def _migrate_legacy(self):
+        """Import translation_history.json from before the journal existed"""
+        if not self.legacy_filename or not os.path.exists(self.legacy_filename):
+            return []
+        with open(self.legacy_filename, 'r', encoding='utf-8') as f:
+            history = json.load(f)
+        return self._rewrite(history)
@@ -1,66 +1,285 @@
-from googletrans import Translator
-from langdetect import detect
-from gtts import gTTS
-import os
-import pygame
+import re
 import time
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dictionary import get_dictionary_info
+from cache import get_cache, fetch_once, MISS
+from audio import get_player
+from http_client import get_translator
+from metrics import get_metrics, span, traced
+from upstream import get_upstream
 
-def detect_language(text):
-    lang =  detect(text)
+# Runs the independent network stages of a lookup side by side
+_pipeline_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='lookup')
+
+# Longer inputs are translated in segments of at most this many characters;
+# googletrans refuses anything over 5000 and long requests are slow anyway
+MAX_SEGMENT_CHARS = 1000
+# Segments of one input translated at the same time. A separate pool, since
+# segmented translations themselves run on _pipeline_executor workers.
+_segment_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='segment')
+
+_LINE_BREAK_RE = re.compile(r'(\s*\n\s*)')
+_SENTENCE_END_RE = re.compile(r'[.!?;。！？；]+(\s*)')
+
+# Han, kana and Hangul blocks. Anything written in them is translated to
+# English; any other letters are treated as English input.
+_CJK_RANGES = (
+    (0x1100, 0x11FF),    # Hangul Jamo
+    (0x3040, 0x30FF),    # Hiragana, Katakana
+    (0x3130, 0x318F),    # Hangul Compatibility Jamo
+    (0x3400, 0x4DBF),    # CJK Extension A
+    (0x4E00, 0x9FFF),    # CJK Unified Ideographs
+    (0xAC00, 0xD7AF),    # Hangul Syllables
+    (0xF900, 0xFAFF),    # CJK Compatibility Ideographs
+    (0x20000, 0x2FA1F),  # CJK Extensions B+ and supplement
+)
+
+def _is_cjk(code):
+    for start, end in _CJK_RANGES:
+        if code < start:
+            return False
+        if code <= end:
+            return True
+    return False
+
+def classify_script(text):
+    """
+    Single pass over the characters: 'zh-tw' if every letter is CJK, 'en' if
+    there are letters and none of them is CJK, None when mixed or letterless.
+    """
+    cjk = other = False
+    for char in text:
+        code = ord(char)
+        if code < 0x80:
+            if not other and char.isalpha():
+                other = True
+        elif _is_cjk(code):
+            cjk = True
+        elif not other and char.isalpha():
+            other = True
+        if cjk and other:
+            return None
+    if cjk:
+        return 'zh-tw'
+    if other:
+        return 'en'
+    return None
+
+_detection_seed = 0
+
+def set_detection_seed(seed=0):
+    """
+    langdetect samples randomly; with a seed its answer for a given text is
+    always the same. Pass None to go back to unseeded detection.
+    """
+    global _detection_seed
+    _detection_seed = seed
+    _detect_with_langdetect.cache_clear()
+
+@lru_cache(maxsize=4096)
+def _detect_with_langdetect(text):
+    # Imported on first use: langdetect is slow to import and rarely needed
+    from langdetect import DetectorFactory, detect
+    DetectorFactory.seed = _detection_seed
+    try:
+        lang = detect(text)
+    except Exception:
+        # No usable features (digits, punctuation...)
+        return "en"
     if lang in ['zh-cn', 'zh-tw', 'zh', 'ko', 'ja']:
         return 'zh-tw'
     else:
         return "en"
 
-def translate_text(text):
-    translator = Translator()
-    lang = detect_language(text)
+def detect_language(text):
+    # The script decides almost every input; langdetect only breaks ties
+    with span('detect'):
+        return classify_script(text) or _detect_with_langdetect(text)
+
+def translate_text(text, lang=None):
+    """Translate text, reusing an already detected language when given"""
+    if lang is None:
+        lang = detect_language(text)
     # Chinese -> English, anything else -> Traditional Chinese
     dest_lang = 'en' if lang in ['zh-cn', 'zh-tw', 'zh'] else 'zh-tw'
     if dest_lang != "en": lang = "en"
-    result = translator.translate(text, dest=dest_lang, src=lang)
+
+    if needs_segmenting(text):
+        translation = ''
+        for translation in iter_translation(text, lang):
+            pass
+        return translation
+
+    cache = get_cache()
+    with span('translate.cache'):
+        cached = cache.get('translations', text, lang, dest_lang)
+    if cached is not MISS:
+        return cached
+
+    # Concurrent requests for the same text share one Google round-trip
+    key = ('translations', cache.make_key('translations', text, lang, dest_lang))
+    try:
+        return fetch_once(key, _fetch_translation, text, lang, dest_lang)
+    except Exception:
+        # Google is failing; an expired translation beats none
+        stale = cache.get('translations', text, lang, dest_lang, allow_stale=True)
+        if stale is not MISS:
+            return stale
+        raise
+
+def needs_segmenting(text):
+    return len(text) > MAX_SEGMENT_CHARS or '\n' in text.strip()
+
+def split_segments(text, max_chars=MAX_SEGMENT_CHARS):
+    """
+    Split text into (segment, gap) pairs with ''.join(segment + gap) == text.
+    Line and paragraph breaks always end a segment and stay in the gaps, so
+    the layout survives translation untouched. Lines over max_chars are cut
+    at sentence ends (or, failing that, between words) and the sentences
+    packed back into segments of at most max_chars.
+    """
+    parts = _LINE_BREAK_RE.split(text)
+    segments = []
+    for i in range(0, len(parts), 2):
+        line = parts[i]
+        separator = parts[i + 1] if i + 1 < len(parts) else ''
+        if not line:
+            # Text starting with a line break
+            segments.append(('', separator))
+            continue
+        pieces = [(line, '')] if len(line) <= max_chars else _split_line(line, max_chars)
+        pieces[-1] = (pieces[-1][0], pieces[-1][1] + separator)
+        segments.extend(pieces)
+    return segments
+
+def _split_line(line, max_chars):
+    units = []
+    position = 0
+    for match in _SENTENCE_END_RE.finditer(line):
+        units.append((line[position:match.start(1)], match.group(1)))
+        position = match.end()
+    if position < len(line):
+        units.append((line[position:], ''))
+
+    # A sentence that is still too long is cut between words, or anywhere
+    # if it has no spaces
+    bounded = []
+    for unit, gap in units:
+        while len(unit) > max_chars:
+            cut = unit.rfind(' ', 0, max_chars)
+            if cut <= 0:
+                cut = max_chars
+            bounded.append((unit[:cut], ''))
+            unit = unit[cut:]
+        bounded.append((unit, gap))
+
+    pieces = []
+    for unit, gap in bounded:
+        if pieces and len(pieces[-1][0]) + len(pieces[-1][1]) + len(unit) <= max_chars:
+            previous, previous_gap = pieces[-1]
+            pieces[-1] = (previous + previous_gap + unit, gap)
+        else:
+            pieces.append((unit, gap))
+    return pieces
+
+def iter_translation(text, lang=None, timings=None):
+    """
+    Translate text segment by segment (see split_segments), a few segments
+    at a time, each cached on its own. Yields the translation so far each
+    time the in-order prefix grows; the last value is the full translation.
+    Unchanged segments of an edited text come straight from the cache.
+    """
+    if lang is None:
+        lang = detect_language(text)
+    segments = split_segments(text)
+    futures = [
+        _segment_executor.submit(traced, timings, translate_text, segment, lang)
+        if segment.strip() else None
+        for segment, _ in segments
+    ]
+    translated = []
+    try:
+        for (segment, gap), future in zip(segments, futures):
+            translated.append((future.result() if future else segment) + gap)
+            yield ''.join(translated)
+    finally:
+        for future in futures:
+            if future is not None:
+                future.cancel()
+
+def _fetch_translation(text, lang, dest_lang):
+    translator = get_translator()
+    with span('translate.google'):
+        result = get_upstream('google').call(translator.translate, text, dest=dest_lang, src=lang)
+    get_cache().set('translations', text, lang, dest_lang, result.text)
     return result.text
 
-def get_word_info(text, detected_lang):
+def iter_word_info(text, detected_lang=None, concurrent=True):
     """
-    Get comprehensive word information including translation and dictionary data
+    Run the lookup pipeline and yield (stage, result) after each stage finishes.
+    Stages are 'detect', 'translation' and 'dictionary'; the same result dict
+    is filled in place, so each yield is the most complete view so far.
+    result['timings'] collects the time (ms) spent in each traced span.
+
+    Long or multi-line input is translated in segments, with a 'partial'
+    stage each time more of the translation is ready. A dictionary lookup
+    of a whole passage finds nothing, so it is skipped for such input.
+
+    For English input the translation and the dictionary fetch don't depend on
+    each other and run concurrently. For Chinese input the dictionary lookup
+    needs the English translation, so the two stages run in order. Callers
+    that already parallelize across words can pass concurrent=False to run
+    every stage inline on the calling thread.
     """
+    timings = {}
+    started = time.perf_counter()
+    lang = detected_lang or traced(timings, detect_language, text)
     result = {
         'input': text,
-        'detected_lang': detected_lang,
-        'translation': translate_text(text),
-        'dictionary': None
+        'detected_lang': lang,
+        'translation': None,
+        'dictionary': None,
+        'timings': timings,
     }
-    
-    # Get dictionary info for English words only
-    if detected_lang == 'en':  # Single word or two words max
-        dictionary_info = get_dictionary_info(text)
-        if dictionary_info:
-            result['dictionary'] = dictionary_info
+    yield 'detect', result
+
+    # Spans are traced per call rather than around the yields, so nothing
+    # leaks into the caller's thread while this generator is suspended
+    if needs_segmenting(text):
+        for partial in iter_translation(text, lang, timings):
+            result['translation'] = partial
+            yield 'partial', result
+        yield 'translation', result
+        yield 'dictionary', result
+    elif lang == 'en' and concurrent:
+        futures = {
+            _pipeline_executor.submit(traced, timings, translate_text, text, lang): 'translation',
+            _pipeline_executor.submit(traced, timings, get_dictionary_info, text): 'dictionary',
+        }
+        for future in as_completed(futures):
+            stage = futures[future]
+            result[stage] = future.result()
+            yield stage, result
     else:
-        dictionary_info = get_dictionary_info(result['translation'])
-        if dictionary_info:
-            result['dictionary'] = dictionary_info
-    
-    result['detected_lang'] = detect(text)
-    
+        result['translation'] = traced(timings, translate_text, text, lang)
+        yield 'translation', result
+        # English input is looked up as typed, anything else via its translation
+        english = text if lang == 'en' else result['translation']
+        result['dictionary'] = traced(timings, get_dictionary_info, english)
+        yield 'dictionary', result
+    total = time.perf_counter() - started
+    get_metrics().observe('lookup.total', total)
+    timings['total'] = round(total * 1000, 1)
+
+def get_word_info(text, detected_lang=None, concurrent=True):
+    """
+    Get comprehensive word information including translation and dictionary data
+    """
+    for _, result in iter_word_info(text, detected_lang, concurrent):
+        pass
     return result
 
 def speak_english(text):
-    tts = gTTS(text=text, lang='en')
-    filename = "temp_audio.mp3"
-    tts.save(filename)
-
-    pygame.mixer.init()
-    pygame.mixer.music.load(filename)
-    time.sleep(0.2)
-    pygame.mixer.music.play()
-
-    # 等待播放完成
-    while pygame.mixer.music.get_busy():
-        time.sleep(0.1)
-
-    pygame.mixer.music.unload()
-    pygame.mixer.quit()
-    os.remove(filename)
\ No newline at end of file
+    """Queue text for playback; interrupts anything currently playing"""
+    get_player().speak(text, lang='en')
@@ -1,14 +1,29 @@
 import tkinter as tk
 from tkinter import ttk, scrolledtext
 import keyboard
-import threading
+import queue
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
-from translator import detect_language, translate_text, speak_english, get_word_info
+from translator import detect_language, speak_english, iter_word_info
 from storage import HistoryStorage
+from history_index import HistoryIndex
+from history_list import VirtualListbox
+from prefetch import Prefetcher
+from audio import current_player
+import startup
+
+# How often worker results are drained into Tk (~60 fps)
+UI_POLL_MS = 16
+# Wait this long after the last keystroke before re-filtering history
+SEARCH_DEBOUNCE_MS = 150
+# Stored history is handed to the list this many entries per Tk tick
+HISTORY_LOAD_CHUNK = 2000
+# Typing pause before a typeahead prefetch starts
+PREFETCH_DEBOUNCE_MS = 300
 
 class TranslatorUI:
-    def __init__(self):
+    def __init__(self, prefetch=False, client=None):
         self.root = tk.Tk()
         self.root.title("Omni Translator")
         self.root.geometry("800x600")
@@ -21,18 +36,47 @@ class TranslatorUI:
         except:
             pass  # Fallback if icon file is not found
         
-        # Translation history
-        self.history = []
-        self.filtered_history = []  # For search filtering
+        # Translation history: compact records, indexed for search; full
+        # entries are read back from storage when one is shown
+        self.history_index = HistoryIndex()
+        self.filtered_history = self.history_index.view()  # what the list shows, as index positions
+        self.search_after_id = None
+        self.history_loading = False
+        self.pending_history = []  # records added while history is still loading
         self.last_result = None
-        self.storage = HistoryStorage("translation_history.json")
+        self.storage = HistoryStorage()
+        
+        # Lookups run on worker threads; results come back through ui_queue and
+        # are only shown if they belong to the latest lookup generation
+        self.executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='ui-lookup')
+        self.ui_queue = queue.Queue()
+        self.lookup_generation = 0
+        # A daemon.DaemonClient when lookups and playback run in the daemon
+        self.client = client
+        
+        # Opt-in typeahead: look up what's being typed before Enter is pressed
+        self.prefetcher = Prefetcher(client=client)
+        self.prefetch_enabled = tk.BooleanVar(value=prefetch)
+        self.prefetch_after_id = None
         # self.root.protocol("WM_DELETE_WINDOW", self.toggle_window)
         self.root.bind("<Unmap>", self.on_minimize)
+        self.map_binding = self.root.bind("<Map>", self.on_first_paint)
         
         self.setup_ui()
         self.setup_hotkeys()
         self.load_history()
         self.show_window()
+        self.root.after(UI_POLL_MS, self.poll_ui_queue)
+        
+    def on_first_paint(self, event):
+        """Warm up the heavy dependencies once the window is on screen"""
+        # Child widgets' <Map> events reach the root binding too
+        if event.widget is not self.root or self.map_binding is None:
+            return
+        self.root.unbind("<Map>", self.map_binding)
+        self.map_binding = None
+        startup.mark('first_paint')
+        self.executor.submit(startup.warm_up)
         
     def setup_ui(self):
         # Main frame
@@ -47,6 +91,17 @@ class TranslatorUI:
         self.input_entry = ttk.Entry(input_frame, font=("Arial", 12))
         self.input_entry.pack(fill=tk.X, pady=(5, 0))
         self.input_entry.bind('<Return>', self.on_enter)
+        self.input_entry.bind('<KeyRelease>', self.on_input_changed)
+        
+        status_frame = ttk.Frame(input_frame)
+        status_frame.pack(fill=tk.X, pady=(2, 0))
+        
+        self.status_label = ttk.Label(status_frame, text="", foreground="gray")
+        self.status_label.pack(side=tk.LEFT)
+        
+        ttk.Checkbutton(
+            status_frame, text="輸入時預先翻譯", variable=self.prefetch_enabled, command=self.on_prefetch_toggled
+        ).pack(side=tk.RIGHT)
         
         # Content frame with history and description
         content_frame = ttk.Frame(main_frame)
@@ -69,12 +124,11 @@ class TranslatorUI:
         history_scroll_frame = ttk.Frame(history_frame)
         history_scroll_frame.pack(fill=tk.BOTH, expand=True)
         
-        self.history_listbox = tk.Listbox(history_scroll_frame, font=("Arial", 10))
-        history_scrollbar = ttk.Scrollbar(history_scroll_frame, orient=tk.VERTICAL, command=self.history_listbox.yview)
-        self.history_listbox.configure(yscrollcommand=history_scrollbar.set)
-        
-        self.history_listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        history_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.history_listbox = VirtualListbox(
+            history_scroll_frame, format_item=lambda record: record.input, font=("Arial", 10)
+        )
+        self.history_listbox.pack(fill=tk.BOTH, expand=True)
+        self.history_listbox.set_items(self.filtered_history)
         
         self.history_listbox.bind('<Double-Button-1>', self.on_history_click)
         
@@ -131,76 +185,184 @@ class TranslatorUI:
             self.input_entry.delete(0, tk.END)
             self.input_entry.insert(0, input_text)
             
+        # Anything shown from here on replaces answers still in flight
+        self.lookup_generation += 1
+        self.cancel_prefetch()
+            
         # Check if same as last result
         if self.last_result and input_text == self.last_result['input']:
             self.play_sound_async(self.last_result['english_text'])
             return
         
         # Check if input exists in history
-        history_index, existing_result = self.find_in_history(input_text)
-        if existing_result:
+        record = self.history_index.find_exact(input_text)
+        if record:
             # Found in history - display existing result and highlight
+            existing_result = self.storage.load_entry(record)
             self.display_result(existing_result)
             self.last_result = existing_result
             self.play_sound_async(existing_result['english_text'])
-            # Highlight the item in history list
-            self.history_listbox.selection_clear(0, tk.END)
-            self.history_listbox.selection_set(history_index)
-            self.history_listbox.see(history_index)
+            self.highlight_in_history(record)
+            return
+            
+        # Prefetched while typing - show it as a finished lookup
+        word_info = self.prefetcher.take(input_text)
+        if word_info is not None:
+            self.on_lookup_update(self.lookup_generation, 'done', word_info)
             return
             
         # New translation
         self.process_translation(input_text)
         
+    def on_input_changed(self, event):
+        if event.keysym == 'Return' or not self.prefetch_enabled.get():
+            return
+        self.cancel_prefetch()
+        self.prefetch_after_id = self.root.after(PREFETCH_DEBOUNCE_MS, self.start_prefetch)
+        
+    def on_prefetch_toggled(self):
+        if not self.prefetch_enabled.get():
+            self.cancel_prefetch()
+            
+    def cancel_prefetch(self):
+        if self.prefetch_after_id is not None:
+            self.root.after_cancel(self.prefetch_after_id)
+            self.prefetch_after_id = None
+        self.prefetcher.cancel()
+        
+    def start_prefetch(self):
+        self.prefetch_after_id = None
+        text = self.input_entry.get().strip()
+        # Same normalization on_enter applies
+        if any(c.isupper() for c in text):
+            text = text.lower()
+        if not text or (self.last_result and text == self.last_result['input']):
+            return
+        # Entries already in history are shown without a lookup anyway
+        if self.history_index.find_exact(text) is not None:
+            return
+        self.prefetcher.request(text)
+        
     def process_translation(self, text):
+        generation = self.lookup_generation
+        self.description_text.delete(1.0, tk.END)
+        self.description_text.insert(tk.END, "翻譯中...")
+        self.executor.submit(self.run_lookup, generation, text)
+        
+    def run_lookup(self, generation, text):
+        """Worker thread: run the lookup pipeline and post each stage to the UI"""
         try:
-            lang = detect_language(text)
-            
-            # Get comprehensive word information (translation + dictionary)
-            word_info = get_word_info(text, lang)
-            
-            # Determine which text to speak (always the English text)
-            english_text = word_info['translation'] if lang in ['zh-cn', 'zh-tw', 'zh'] else text
-            
-            # Create result object
-            result = {
-                'input': text,
-                'detected_lang': lang,
-                'translation': word_info['translation'],
-                'english_text': english_text,
-                'dictionary': word_info.get('dictionary'),
-                'timestamp': datetime.now().strftime("%H:%M:%S")
-            }
+            # Typeahead prefetches stand down while a real lookup runs
+            with self.prefetcher.foreground():
+                if self.client is not None:
+                    stages = self.client.iter_word_info(text)
+                else:
+                    stages = iter_word_info(text, detect_language(text))
+                word_info = None
+                for stage, word_info in stages:
+                    if stage != 'detect':
+                        self.ui_queue.put((self.on_lookup_update, (generation, stage, dict(word_info))))
+            self.ui_queue.put((self.on_lookup_update, (generation, 'done', dict(word_info))))
+        except Exception as e:
+            self.ui_queue.put((self.on_lookup_update, (generation, 'error', e)))
             
-            self.last_result = result
-            self.add_to_history(result)
+    def poll_ui_queue(self):
+        """Run callbacks posted by worker threads on the Tk thread"""
+        try:
+            while True:
+                callback, args = self.ui_queue.get_nowait()
+                callback(*args)
+        except queue.Empty:
+            pass
+        self.update_playback_status()
+        self.root.after(UI_POLL_MS, self.poll_ui_queue)
+        
+    def update_playback_status(self):
+        if self.client is not None:
+            # Playback happens in the daemon
+            return
+        # Don't start the player (pygame, mixer) just to show that it's idle
+        player = current_player()
+        if player is None:
+            return
+        if player.state == player.PLAYING:
+            status = f"▶ 播放中: {player.current_text}"
+        elif player.state == player.LOADING:
+            status = f"… 載入語音: {player.current_text}"
+        else:
+            status = ""
+        if self.status_label.cget('text') != status:
+            self.status_label.configure(text=status)
+        
+    def on_lookup_update(self, generation, stage, payload):
+        is_current = generation == self.lookup_generation
+        
+        if stage == 'error':
+            if is_current:
+                self.description_text.delete(1.0, tk.END)
+                self.description_text.insert(tk.END, f"翻譯錯誤: {str(payload)}")
+            return
+        
+        result = self.build_result(payload)
+        if stage == 'done':
+            startup.mark('first_result')
+            startup.report_once()
+            # Superseded lookups still land in history, they just aren't shown
+            if self.history_index.find_exact(result['input']) is None:
+                self.add_to_history(result)
+            if is_current:
+                self.last_result = result
+                self.display_result(result)
+                self.play_sound_async(result['english_text'])
+        elif is_current:
+            # Show translation and dictionary data as soon as each one arrives
             self.display_result(result)
-            self.play_sound_async(english_text)
             
-        except Exception as e:
-            self.description_text.delete(1.0, tk.END)
-            self.description_text.insert(tk.END, f"翻譯錯誤: {str(e)}")
+    def build_result(self, word_info):
+        """Create a history/result object from (possibly partial) word info"""
+        lang = word_info['detected_lang']
+        # Determine which text to speak (always the English text)
+        english_text = word_info['translation'] if lang in ['zh-cn', 'zh-tw', 'zh'] else word_info['input']
+        
+        return {
+            'input': word_info['input'],
+            'detected_lang': lang,
+            'translation': word_info['translation'],
+            'english_text': english_text,
+            'dictionary': word_info.get('dictionary'),
+            'timings': dict(word_info.get('timings') or {}),
+            'timestamp': datetime.now().strftime("%H:%M:%S")
+        }
             
     def add_to_history(self, result):
-        self.history.append(result)
+        record = self.storage.append(result)  # assigns result['id']
+        if self.history_loading:
+            # Shown once the stored history has finished loading
+            self.pending_history.append(record)
+        else:
+            self.show_in_history(record)
+            
+    def show_in_history(self, record):
+        if record.id in self.history_index:
+            return
+        self.history_index.add(record)
         
         # Update filtered history if no search is active
         if not self.history_search.get():
-            self.filtered_history.append(result)
-            display_text = f"{result['input']}"
-            self.history_listbox.insert(tk.END, display_text)
-            self.history_listbox.see(tk.END)
+            self.filtered_history.append(record)
+            self.history_listbox.see(len(self.filtered_history) - 1)
         else:
             # Refresh the filtered view
             self.filter_history(self.history_search.get().lower())
         
-        self.save_history()
-        
     def display_result(self, result):
         self.description_text.delete(1.0, tk.END)
         
         content = "=== Google 翻譯 ===\n"
-        content += f"{result['translation']}\n"
+        if result['translation'] is None:
+            content += "翻譯中...\n"
+        else:
+            content += f"{result['translation']}\n"
         
         # Add dictionary information if available
         if result.get('dictionary'):
@@ -228,6 +390,10 @@ class TranslatorUI:
         content += f"檢測語言: {result['detected_lang']}\n"
         content += f"發音文字: {result['english_text']}\n"
         content += f"時間: {result['timestamp']}\n"
+        if result.get('timings'):
+            content += "耗時:\n"
+            for stage, ms in result['timings'].items():
+                content += f"  {stage}: {ms:.1f} ms\n"
         
         self.description_text.insert(tk.END, content)
         
@@ -236,7 +402,8 @@ class TranslatorUI:
         if selection:
             index = selection[0]
             if index < len(self.filtered_history):
-                result = self.filtered_history[index]
+                result = self.storage.load_entry(self.filtered_history[index])
+                self.lookup_generation += 1
                 self.display_result(result)
                 self.last_result = result
                 # Update search input to match
@@ -247,6 +414,13 @@ class TranslatorUI:
                 self.play_sound_async(result['english_text'])
                 
     def on_history_search(self, event):
+        # Debounce: only filter once typing pauses
+        if self.search_after_id is not None:
+            self.root.after_cancel(self.search_after_id)
+        self.search_after_id = self.root.after(SEARCH_DEBOUNCE_MS, self.apply_history_search)
+        
+    def apply_history_search(self):
+        self.search_after_id = None
         search_text = self.history_search.get().lower()
         self.filter_history(search_text)
         
@@ -261,74 +435,90 @@ class TranslatorUI:
         if filtered_index >= len(self.filtered_history):
             return
             
-        # Get the selected item from filtered history
-        selected_item = self.filtered_history[filtered_index]
-        
-        # Find and remove from main history
-        for i, item in enumerate(self.history):
-            if item == selected_item:
-                del self.history[i]
-                break
+        # Get the selected record; its id identifies it everywhere else
+        record = self.filtered_history[filtered_index]
+        self.history_index.remove(record)
         
         # Remove from filtered history and listbox
         del self.filtered_history[filtered_index]
-        self.history_listbox.delete(filtered_index)
+        self.history_listbox.selection_clear()
+        self.history_listbox.refresh()
         
-        # Save updated history
-        self.save_history()
+        # Journal the deletion
+        self.storage.delete(record.id)
         
         # Clear description if the deleted item was being displayed
-        if self.last_result == selected_item:
+        if self.last_result and self.last_result.get('id') == record.id:
             self.description_text.delete(1.0, tk.END)
             self.last_result = None
                 
     def play_sound_async(self, text):
-        # Play sound in separate thread to avoid blocking UI
-        threading.Thread(target=lambda: speak_english(text), daemon=True).start()
+        if self.client is not None:
+            # A round-trip to the daemon; keep it off the Tk thread
+            self.executor.submit(self.speak_via_daemon, text)
+            return
+        # The playback service synthesizes and plays on its own worker thread
+        speak_english(text)
         
-    def find_in_history(self, input_text):
-        """Find existing translation in history by input text"""
-        for i, result in enumerate(self.history):
-            if result['input'].lower() == input_text.lower():
-                return i, result
-        return None, None
+    def speak_via_daemon(self, text):
+        try:
+            self.client.speak(text)
+        except Exception as e:
+            print(f"Daemon speak error: {e}")
+            speak_english(text)
+        
+    def highlight_in_history(self, record):
+        """Select and scroll to record in the history list, if the current filter shows it"""
+        self.history_listbox.selection_clear()
+        index = self.filtered_history.position(record)
+        if index is None:
+            return
+        self.history_listbox.selection_set(index)
+        self.history_listbox.see(index)
         
     def filter_history(self, search_text):
         """Filter history based on search text and update the listbox"""
-        self.history_listbox.delete(0, tk.END)
+        self.filtered_history = self.history_index.search(search_text)
+        self.history_listbox.set_items(self.filtered_history)
         
-        if not search_text:
-            # Show all history
-            self.filtered_history = self.history.copy()
-        else:
-            # Filter history based on search text
-            self.filtered_history = [
-                result for result in self.history
-                if search_text in result['input'].lower() or 
-                   (result.get('translation') and search_text in result['translation'].lower())
-            ]
-        
-        # Populate listbox with filtered results
-        for result in self.filtered_history:
-            display_text = f"{result['input']}"
-            self.history_listbox.insert(tk.END, display_text)
-        
-    def save_history(self):
-        self.storage.save_history(self.history)
-            
     def load_history(self):
-        self.history = self.storage.load_history()
-        self.filtered_history = self.history.copy()  # Initially show all history
-                    
-        # Populate history listbox
-        for result in self.history:
-            display_text = f"{result['input']}"
-            # display_text = f"[{result['timestamp']}] {result['input'][:30]}{'...' if len(result['input']) > 30 else ''}"
-            self.history_listbox.insert(tk.END, display_text)
+        """Read stored history off the Tk thread, then show it in chunks"""
+        self.history_loading = True
+        self.executor.submit(self.read_stored_history)
+        
+    def read_stored_history(self):
+        records = self.storage.load_history()
+        self.ui_queue.put((self.load_history_chunk, (records, 0)))
+        
+    def load_history_chunk(self, records, start):
+        chunk = records[start:start + HISTORY_LOAD_CHUNK]
+        for record in chunk:
+            self.history_index.add(record)
+        if not self.history_search.get():
+            self.filtered_history.extend(chunk)
+            self.history_listbox.refresh()
             
+        if start + HISTORY_LOAD_CHUNK < len(records):
+            self.root.after(1, self.load_history_chunk, records, start + HISTORY_LOAD_CHUNK)
+            return
+        
+        self.history_loading = False
+        if self.history_search.get():
+            self.filter_history(self.history_search.get().lower())
+        for record in self.pending_history:
+            self.show_in_history(record)
+        self.pending_history = []
+        
         # Set last result to most recent
-        if self.history:
-            self.last_result = self.history[-1]
+        last_record = self.history_index.last()
+        if last_record is not None and self.last_result is None:
+            self.last_result = self.storage.load_entry(last_record)
         
     def run(self):
-        self.root.mainloop()
\ No newline at end of file
+        self.root.mainloop()
+        player = current_player()
+        if player is not None:
+            player.shutdown()
+        self.prefetcher.shutdown()
+        self.storage.close()
+        self.executor.shutdown(wait=False, cancel_futures=True)
\ No newline at end of file
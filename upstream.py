@@ -0,0 +1,245 @@
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, Optional
+
+class CircuitOpen(Exception):
+    """Raised without calling the upstream while its circuit breaker is open"""
+
+class Throttled(Exception):
+    """The upstream asked us to slow down (HTTP 429 or similar)"""
+
+class RateLimiter:
+    """Token bucket: allows ``rate`` acquisitions per second with bursts up to ``burst``"""
+
+    def __init__(self, rate: float, burst: Optional[int] = None):
+        self.rate = rate
+        self.capacity = burst or max(1, int(rate))
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                self._refill(time.monotonic())
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def try_acquire(self) -> bool:
+        """Take a token if one is available right now"""
+        with self._lock:
+            self._refill(time.monotonic())
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+    def set_rate(self, rate: float):
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate = rate
+
+class CircuitBreaker:
+    """
+    Opens after ``failure_threshold`` failures in a row and fails fast for
+    ``reset_timeout`` seconds. Then a single probe call is let through:
+    success closes the circuit again, failure keeps it open.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half-open'
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self.opened_at < self.reset_timeout:
+                    return False
+                self.state = self.HALF_OPEN
+                self._probing = False
+            if self.state == self.HALF_OPEN:
+                if self._probing:
+                    return False
+                self._probing = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+                self._probing = False
+
+# Hedged attempts run here so the caller can wait on whichever finishes first.
+# Every attempt goes through this pool once hedging starts, so it must not be
+# smaller than the number of calls in flight (batch/daemon concurrency, times
+# two for hedges) or it caps throughput; threads are only started as needed.
+_hedge_executor = ThreadPoolExecutor(max_workers=64, thread_name_prefix='upstream')
+
+class Upstream:
+    """
+    Call policy for one upstream service.
+
+    Every attempt takes a token from a per-host bucket whose rate backs off
+    when the service throttles us and creeps back up while it doesn't.
+    Failures are retried with jittered exponential backoff. Once enough
+    latencies are known, an attempt that runs longer than the recent p95 is
+    hedged with a second identical request (for at most one attempt in
+    ten) and the first answer wins. A
+    circuit breaker fails calls fast while the service keeps failing, so
+    callers can fall back to cached data instead of waiting on timeouts.
+    """
+
+    # Successful latencies needed before hedging starts
+    HEDGE_MIN_SAMPLES = 20
+    # At most this share of attempts is hedged, so hedges can't double the
+    # load when everything slows down at once
+    HEDGE_BUDGET = 0.1
+
+    def __init__(self, name: str, rate: float = 5.0, burst: Optional[int] = None, retries: int = 2,
+                 backoff: float = 0.2, max_backoff: float = 2.0, hedge: bool = True,
+                 failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.max_rate = rate
+        self.min_rate = rate / 8
+        self.limiter = RateLimiter(rate, burst)
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.hedge = hedge
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self._latencies = deque(maxlen=200)
+        self._hedge_credit = 0.0
+        self._lock = threading.Lock()
+
+    def call(self, function, *args, **kwargs):
+        """Call function(*args, **kwargs) under this upstream's policy"""
+        for attempt in range(self.retries + 1):
+            if not self.breaker.allow():
+                raise CircuitOpen(f"{self.name} is unavailable, not retrying for now")
+            try:
+                result = self._attempt(function, args, kwargs)
+            except Exception as e:
+                self.breaker.record_failure()
+                self._on_failure(e)
+                if attempt == self.retries:
+                    raise
+                # Full jitter keeps retries from many callers from lining up
+                time.sleep(random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt)))
+            else:
+                self.breaker.record_success()
+                self._on_success()
+                return result
+
+    def hedge_delay(self) -> Optional[float]:
+        """Recent p95 latency, or None while there's too little data to hedge"""
+        with self._lock:
+            if not self.hedge or len(self._latencies) < self.HEDGE_MIN_SAMPLES:
+                return None
+            latencies = sorted(self._latencies)
+        return latencies[int(len(latencies) * 0.95) - 1]
+
+    def _take_hedge_credit(self) -> bool:
+        with self._lock:
+            if self._hedge_credit < 1:
+                return False
+            self._hedge_credit -= 1
+            return True
+
+    def _timed(self, function, args, kwargs):
+        started = time.perf_counter()
+        result = function(*args, **kwargs)
+        with self._lock:
+            self._latencies.append(time.perf_counter() - started)
+        return result
+
+    def _attempt(self, function, args, kwargs):
+        self.limiter.acquire()
+        delay = self.hedge_delay()
+        if delay is None:
+            return self._timed(function, args, kwargs)
+        with self._lock:
+            self._hedge_credit = min(10.0, self._hedge_credit + self.HEDGE_BUDGET)
+
+        primary = _hedge_executor.submit(self._timed, function, args, kwargs)
+        done, _ = wait([primary], timeout=delay)
+        # The hedge only goes out if it fits the hedge and rate budgets right now
+        if done or not self._take_hedge_credit() or not self.limiter.try_acquire():
+            return primary.result()
+
+        pending = {primary, _hedge_executor.submit(self._timed, function, args, kwargs)}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def _on_failure(self, error: Exception):
+        if isinstance(error, Throttled) or '429' in str(error):
+            # Multiplicative decrease
+            self.limiter.set_rate(max(self.min_rate, self.limiter.rate / 2))
+
+    def _on_success(self):
+        if self.limiter.rate < self.max_rate:
+            # Additive increase back towards the configured rate
+            self.limiter.set_rate(min(self.max_rate, self.limiter.rate + self.max_rate / 20))
+
+# Per-host defaults; see configure(). They cap throughput no matter how many
+# lookups run side by side: at 5 req/s a batch run does about 5 words/s.
+_settings: Dict[str, Dict] = {
+    'google': {'rate': 5.0, 'burst': 10},
+    'cambridge': {'rate': 5.0, 'burst': 10},
+    'tts': {'rate': 3.0, 'burst': 6},
+}
+
+_upstreams: Dict[str, Upstream] = {}
+_lock = threading.Lock()
+
+def configure(name: str, **settings):
+    """Change the policy for one upstream (any Upstream argument); applies to new calls"""
+    with _lock:
+        _settings[name] = dict(_settings.get(name, {}), **settings)
+        _upstreams.pop(name, None)
+
+def set_rate(rate: float, names=('google', 'cambridge', 'tts')):
+    """Allow ``rate`` requests per second to each named upstream, with bursts of twice that"""
+    for name in names:
+        configure(name, rate=rate, burst=max(1, int(rate * 2)))
+
+def get_upstream(name: str) -> Upstream:
+    upstream = _upstreams.get(name)
+    if upstream is None:
+        with _lock:
+            upstream = _upstreams.get(name)
+            if upstream is None:
+                upstream = _upstreams[name] = Upstream(name, **_settings.get(name, {}))
+    return upstream